@@ -1,14 +1,12 @@
 #!/usr/bin/env python3
 # benchmark.py – outputs console + log file
 
-import time, statistics, pathlib
+import argparse, multiprocessing, os, threading, time, statistics, pathlib
 from datetime import datetime
-from clients.repository_client import RepositoryClient
+from clients.repository_client import RepositoryClient, rendezvous_owner
 from clients.reliabie_client   import ReliableClient
-from message_brokers.streams_broker import RedisStreamsBroker
-from message_brokers.redis_broker     import RedisMessageBroker
-from message_brokers.rabbitmq_broker  import RabbitMQBroker
-from message_brokers.kafka_broker     import KafkaBroker
+from message_brokers.factory import get_broker
+from message_brokers.fault_broker import FaultInjectingBroker
 import clients.client as _cl
 
 # Prevent file logging for the benchmark 
@@ -20,6 +18,7 @@ _cl.LoggingClient.log_to_publish_file      = lambda *a, **k: None
 # 
 
 LOGFILE = pathlib.Path("benchmark_results.txt")
+FAULT_LOGFILE = pathlib.Path("benchmark_faults.txt")
 
 def bench(label, broker, n=40):
     # Start background listener if the broker needs one (Redis)
@@ -59,25 +58,232 @@ def bench(label, broker, n=40):
         except Exception:
             pass                      # swallow any shutdown errors        
 
+BACKENDS = {
+    "redis":   {"type": "redis", "host": "localhost", "port": 6379},
+    "streams": {"type": "redis_streams", "host": "localhost", "port": 6379},
+    "rabbit":  {"type": "rabbitmq", "host": "localhost", "port": 5672,
+                "username": "guest", "password": "guest", "vhost": "/"},
+    "kafka":   {"type": "kafka", "bootstrap_servers": ["localhost:9092"]},
+}
+
 def factory(kind):
-    if kind == "redis":
-        return RedisMessageBroker()
-    if kind == "streams":
-        return RedisStreamsBroker()
-    if kind == "rabbit":
-        return RabbitMQBroker(
-            host="localhost", port=5672,
-            username="guest", password="guest", vhost="/"
-        )
-    if kind == "kafka":
-        return KafkaBroker(bootstrap_servers=["localhost:9092"])
-    raise ValueError(kind)
-
-
-if not LOGFILE.exists():
-    LOGFILE.write_text("utc_timestamp\tbackend\tmessages\tmsg_per_s\tavg_ms\n")
-
-# run benchmarks 
-for name in ("redis", "streams", "rabbit", "kafka"):
-    print(f"Benchmarking {name} …")
-    bench(name, factory(name))
+    if kind not in BACKENDS:
+        raise ValueError(kind)
+    # Built eagerly so connection setup is not timed as part of the run
+    return get_broker(BACKENDS[kind], lazy=False)
+
+
+def _repository_process(kind, repo_id, channels, heartbeat, ready, stop):
+    # Each repository instance runs in its own process with its own broker
+    broker = factory(kind)
+    broker.start_listener()
+    repo = RepositoryClient(repo_id, broker, "/tmp", fault_probabillity=0.0,
+                            heartbeat_interval=heartbeat)
+    for ch in channels:
+        repo.subscribe(ch)
+    repo.start()
+    ready.set()
+    stop.wait()
+    repo.stop()
+
+def _publisher_process(kind, p, channels, n, n_threads, ready, go, results):
+    # Publishers run in their own processes so the GIL of one publisher
+    # process does not cap the load; each thread keeps one order in flight
+    # and has its own broker, as a broker's subscriber connection is not
+    # safe to share between threads
+    times = []
+    def _publish(client, my_channels):
+        for i in range(n):
+            for ch in my_channels:
+                t0 = time.perf_counter()
+                client.publish(ch, f"m{i}")
+                times.append(time.perf_counter() - t0)
+    clients = []
+    for t in range(n_threads):
+        broker = factory(kind)
+        broker.start_listener()
+        clients.append(ReliableClient(f"pub-{p}-{t}", broker, "/tmp"))
+    threads = [threading.Thread(target=_publish,
+                                args=(client, channels[t::n_threads]),
+                                daemon=True)
+               for t, client in enumerate(clients)]
+    ready.set()
+    go.wait()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    results.put(times)
+
+def bench_repositories(kind, n_repos, n_channels=256, n=20, n_publishers=8,
+                       n_threads=4, heartbeat=0.2):
+    """
+    Repository throughput: n_publishers processes of n_threads threads each
+    send n messages to each of n_channels channels, round-robin over their
+    share of the channels, through n_repos partitioned repositories, so
+    n_publishers * n_threads orders are in flight at once. Enough channels
+    are used that rendezvous hashing splits them evenly.
+    """
+    channels = [f"repo-bench-{i}" for i in range(n_channels)]
+    repo_ids = [f"repo{r}" for r in range(n_repos)]
+    owned = {repo_id: 0 for repo_id in repo_ids}
+    for ch in channels:
+        owned[rendezvous_owner(repo_ids, ch)] += 1
+    stop = multiprocessing.Event()
+    readies, procs = [], []
+    for r in range(n_repos):
+        ready = multiprocessing.Event()
+        p = multiprocessing.Process(
+            target=_repository_process,
+            args=(kind, repo_ids[r], channels, heartbeat, ready, stop),
+            daemon=True)
+        p.start()
+        readies.append(ready)
+        procs.append(p)
+    for ready in readies:
+        ready.wait()
+    # let every instance see every peer before measuring
+    time.sleep(3 * heartbeat)
+
+    go, results = multiprocessing.Event(), multiprocessing.Queue()
+    readies, publishers = [], []
+    for p in range(n_publishers):
+        ready = multiprocessing.Event()
+        proc = multiprocessing.Process(
+            target=_publisher_process,
+            args=(kind, p, channels[p::n_publishers], n, n_threads,
+                  ready, go, results),
+            daemon=True)
+        proc.start()
+        readies.append(ready)
+        publishers.append(proc)
+    for ready in readies:
+        ready.wait()
+    time.sleep(0.5)
+
+    t0 = time.perf_counter()
+    go.set()
+    times = []
+    for _ in publishers:
+        times.extend(results.get())
+    elapsed = time.perf_counter() - t0
+    for proc in publishers:
+        proc.join(2)
+
+    stop.set()
+    for p in procs:
+        p.join(2)
+
+    total  = n * n_channels
+    thr    = total / elapsed
+    avg_ms = statistics.mean(times) * 1e3
+    label  = f"{kind}-repo{n_repos}"
+    split  = "/".join(str(owned[repo_id]) for repo_id in repo_ids)
+    print(f"{label:>14}: {thr:7.0f} msg/s | avg {avg_ms:6.2f} ms | "
+          f"channels per instance {split} | "
+          f"{n_publishers}x{n_threads} publishers | {os.cpu_count()} CPUs")
+    ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    with LOGFILE.open("a") as fp:
+        fp.write(f"{ts}\t{label}\t{total}\t{thr:.0f}\t{avg_ms:.2f}\n")
+
+
+def bench_faults(kind, rate, n=200, delay_ms=1.0, partition_ms=500,
+                 ack_timeout=0.05, seed=1):
+    """
+    Reliable protocol under faults: every channel drops, duplicates and
+    reorders with probability rate and adds exponential delay; halfway
+    through, all channels are partitioned for partition_ms. Reports
+    goodput (unique deliveries per second at the subscriber), p99
+    publish-to-ACK latency and recovery time (partition end to the next
+    completed publish).
+    """
+    spec = {"drop": rate, "duplicate": rate, "reorder": rate,
+            "delay": {"dist": "exponential", "mean": delay_ms / 1e3}}
+    broker = FaultInjectingBroker(factory(kind), {"*": spec}, seed=seed)
+    broker.start_listener()
+
+    repo = RepositoryClient("repo", broker, "/tmp", fault_probabillity=0.0)
+    pub  = ReliableClient("pub", broker, "/tmp", ack_timeout=ack_timeout)
+    sub  = ReliableClient("sub", broker, "/tmp")
+    delivered = []
+    repo.subscribe("faults")
+    sub.subscribe("faults", lambda ch, msg: delivered.append(msg))
+    time.sleep(0.1)
+
+    times, recovery, partition_end = [], None, None
+    t_start = time.perf_counter()
+    for i in range(n):
+        if i == n // 2 and partition_ms:
+            partition_end = broker.partition(partition_ms / 1e3)
+        t0 = time.perf_counter()
+        pub.publish("faults", f"m{i}")
+        times.append(time.perf_counter() - t0)
+        if partition_end and recovery is None and time.monotonic() >= partition_end:
+            recovery = time.monotonic() - partition_end
+    # let in-flight archives and their retransmits land
+    time.sleep(max(0.2, 4 * delay_ms / 1e3))
+    elapsed = time.perf_counter() - t_start
+
+    goodput = len(set(delivered)) / elapsed
+    p99_ms  = statistics.quantiles(times, n=100)[98] * 1e3
+    rec_ms  = (recovery or 0.0) * 1e3
+    stats   = broker.fault_stats()
+    print(f"{kind:>8} rate {rate:5.3f}: goodput {goodput:7.0f} msg/s | "
+          f"p99 {p99_ms:7.2f} ms | recovery {rec_ms:7.2f} ms | "
+          f"delivered {len(set(delivered))}/{n} | retransmits {pub.retransmits} | "
+          f"dups suppressed {repo.dedup.hits + sub.dedup.hits}")
+    ts = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+    with FAULT_LOGFILE.open("a") as fp:
+        fp.write(f"{ts}\t{kind}\t{rate}\t{n}\t{goodput:.0f}\t{p99_ms:.2f}\t"
+                 f"{rec_ms:.2f}\t{len(set(delivered))}\t{pub.retransmits}\t"
+                 f"{stats['dropped']}\t{stats['duplicated']}\t{stats['reordered']}\n")
+
+    try:
+        broker.close()
+    except Exception:
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reliable pub/sub benchmarks")
+    parser.add_argument("--mode", choices=("latency", "repositories", "faults"),
+                        default="latency")
+    parser.add_argument("--backend", default="redis",
+                        help="backend for --mode repositories/faults")
+    parser.add_argument("--repositories", type=int, nargs="+",
+                        default=[1, 2, 4],
+                        help="repository instance counts to compare")
+    parser.add_argument("--fault-rates", type=float, nargs="+",
+                        default=[0.0, 0.01, 0.05, 0.1],
+                        help="drop/duplicate/reorder probabilities to compare")
+    parser.add_argument("--delay-ms", type=float, default=1.0,
+                        help="mean injected delay")
+    parser.add_argument("--partition-ms", type=float, default=500,
+                        help="partition injected halfway through each run")
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    if not LOGFILE.exists():
+        LOGFILE.write_text("utc_timestamp\tbackend\tmessages\tmsg_per_s\tavg_ms\n")
+
+    if args.mode == "latency":
+        # run benchmarks
+        for name in ("redis", "streams", "rabbit", "kafka"):
+            print(f"Benchmarking {name} …")
+            bench(name, factory(name))
+    elif args.mode == "faults":
+        if not FAULT_LOGFILE.exists():
+            FAULT_LOGFILE.write_text(
+                "utc_timestamp\tbackend\tfault_rate\tmessages\tgoodput\tp99_ms\t"
+                "recovery_ms\tdelivered\tretransmits\tdropped\tduplicated\treordered\n")
+        for rate in args.fault_rates:
+            bench_faults(args.backend, rate, delay_ms=args.delay_ms,
+                         partition_ms=args.partition_ms, seed=args.seed)
+    else:
+        for count in args.repositories:
+            print(f"Benchmarking {args.backend} with {count} repositories …")
+            bench_repositories(args.backend, count)
+
+
+if __name__ == "__main__":
+    main()
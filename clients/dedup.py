@@ -0,0 +1,101 @@
+import collections
+import hashlib
+import time
+
+###################################
+# Duplicate Suppression Module    #
+###################################
+
+
+class DedupWindow:
+    """
+    Bounded set of recently seen message IDs.
+
+    Holds at most max_entries IDs, each for at most ttl seconds (if set).
+    With bloom_bits > 0 a Bloom filter sits in front and answers most
+    "never seen" lookups without touching the exact set. It has two
+    generations that rotate every max_entries insertions, so it forgets
+    IDs at the same rate as the window and never gives a false negative.
+    The exact set is kept either way, so the filter saves no memory, and in
+    CPython hashing an ID for it costs more than a dict lookup; it is off
+    by default and only pays when the exact set is slow to probe.
+    """
+
+    def __init__(self, max_entries=100000, ttl=None, bloom_bits=0,
+                 bloom_hashes=4):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._seen = collections.OrderedDict()  # { id: insert time }
+
+        self.bloom_bits = bloom_bits
+        self.bloom_hashes = bloom_hashes
+        if bloom_bits:
+            self._bloom = bytearray((bloom_bits + 7) // 8)
+            self._bloom_prev = bytearray(len(self._bloom))
+        self._bloom_count = 0
+
+        # Counters
+        self.hits = 0
+        self.misses = 0
+        self.bloom_skips = 0
+
+    def _positions(self, msg_id):
+        digest = hashlib.blake2b(msg_id.encode("utf-8"), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.bloom_bits for i in range(self.bloom_hashes)]
+
+    def _in_bloom(self, positions):
+        for bloom in (self._bloom, self._bloom_prev):
+            if all(bloom[p >> 3] >> (p & 7) & 1 for p in positions):
+                return True
+        return False
+
+    def _expire(self):
+        if self.ttl is None:
+            return
+        cutoff = time.monotonic() - self.ttl
+        while self._seen:
+            msg_id, ts = next(iter(self._seen.items()))
+            if ts >= cutoff:
+                break
+            self._seen.popitem(last=False)
+
+    def seen(self, msg_id):
+        """True if msg_id is in the window. Updates the hit/miss counters."""
+        if self.bloom_bits and not self._in_bloom(self._positions(msg_id)):
+            self.bloom_skips += 1
+            self.misses += 1
+            return False
+        self._expire()
+        if msg_id in self._seen:
+            self.hits += 1
+            return True
+        self.misses += 1
+        return False
+
+    def add(self, msg_id):
+        """Remember msg_id, evicting the oldest IDs past max_entries."""
+        self._expire()
+        self._seen[msg_id] = time.monotonic()
+        self._seen.move_to_end(msg_id)
+        while len(self._seen) > self.max_entries:
+            self._seen.popitem(last=False)
+        if self.bloom_bits:
+            for p in self._positions(msg_id):
+                self._bloom[p >> 3] |= 1 << (p & 7)
+            self._bloom_count += 1
+            if self._bloom_count >= self.max_entries:
+                self._bloom_prev = self._bloom
+                self._bloom = bytearray(len(self._bloom_prev))
+                self._bloom_count = 0
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._seen),
+            "hits": self.hits,
+            "misses": self.misses,
+            "bloom_skips": self.bloom_skips,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+        }
@@ -0,0 +1,129 @@
+import collections
+
+###################################
+# Delivery Tracking Module        #
+###################################
+
+
+class DeliveryTracker:
+    """
+    Tracks which subscribers have ACKed each sequence number of one channel.
+
+    window[i] is a bitmap of the subscriber indices that ACKed seq base + i,
+    and low_water[idx] is the highest seq up to which subscriber idx has
+    ACKed everything. Once every subscriber has a seq it leaves the window,
+    so memory is one int per in-flight seq plus one int per subscriber.
+
+    Subscribers register with join(), which tracks them from the next seq
+    on; an ACK from an unknown subscriber registers it at that seq. If the
+    window grows past max_window, subscribers that are more than max_window
+    behind are dropped and the window never holds more than max_window
+    seqs. With no subscribers nothing is in flight and the window is empty.
+    Bit indices of dropped subscribers are reused, so bitmaps stay as wide
+    as the largest number of subscribers tracked at once.
+    """
+
+    def __init__(self, first_seq=1, max_window=65536):
+        self.base = first_seq
+        self.head = first_seq - 1
+        self.max_window = max_window
+        self.window = collections.deque()
+        self.subscribers = {}  # { subscriber id: bit index }
+        self.low_water = []    # indexed by bit index
+        self._active = 0       # bitmap of subscribers still tracked
+        self._free = []        # bit indices of dropped subscribers
+
+    def issue(self):
+        """Allocate the next sequence number."""
+        self.head += 1
+        self.window.append(0)
+        if len(self.window) > self.max_window:
+            for subscriber in self.lagging(self.max_window):
+                self.drop(subscriber)
+        self._trim()
+        while len(self.window) > self.max_window:
+            self.window.popleft()
+            self.base += 1
+        return self.head
+
+    def _register(self, subscriber, start_seq):
+        if self._free:
+            idx = self._free.pop()
+            bit = 1 << idx
+            # Forget the ACKs of the subscriber that held this index before
+            for i in range(len(self.window)):
+                self.window[i] &= ~bit
+            self.low_water[idx] = start_seq - 1
+        else:
+            idx = len(self.low_water)
+            bit = 1 << idx
+            self.low_water.append(start_seq - 1)
+        self.subscribers[subscriber] = idx
+        self._active |= bit
+        # Everything before it joined counts as delivered to it
+        for i in range(start_seq - self.base):
+            self.window[i] |= bit
+        return idx
+
+    def join(self, subscriber):
+        """Track a subscriber from the next issued seq on."""
+        if subscriber not in self.subscribers:
+            self._register(subscriber, self.head + 1)
+
+    def ack(self, subscriber, seq):
+        """Record an ACK. Returns False for seqs outside the window."""
+        if seq < self.base or seq > self.head:
+            return False
+        idx = self.subscribers.get(subscriber)
+        if idx is None:
+            idx = self._register(subscriber, seq)
+        bit = 1 << idx
+        self.window[seq - self.base] |= bit
+
+        lw = max(self.low_water[idx], self.base - 1)
+        while lw < self.head and self.window[lw + 1 - self.base] & bit:
+            lw += 1
+        self.low_water[idx] = lw
+        self._trim()
+        return True
+
+    def drop(self, subscriber):
+        """Stop waiting for a subscriber (gone or hopelessly behind)."""
+        idx = self.subscribers.pop(subscriber, None)
+        if idx is not None:
+            self._active &= ~(1 << idx)
+            self._free.append(idx)
+            self._trim()
+
+    def _trim(self):
+        active = self._active
+        while self.window and self.window[0] & active == active:
+            self.window.popleft()
+            self.base += 1
+
+    def delivered_upto(self):
+        """Highest seq that every tracked subscriber has ACKed."""
+        return self.base - 1
+
+    def missing(self, subscriber, upto):
+        """Seqs up to upto, still in the window, that subscriber lacks."""
+        idx = self.subscribers.get(subscriber)
+        if idx is None:
+            return []
+        bit = 1 << idx
+        start = max(self.low_water[idx], self.base - 1) + 1
+        return [seq for seq in range(start, min(upto, self.head) + 1)
+                if not self.window[seq - self.base] & bit]
+
+    def lagging(self, max_lag):
+        """Tracked subscribers more than max_lag seqs behind the head."""
+        return [subscriber for subscriber, idx in self.subscribers.items()
+                if self.head - self.low_water[idx] > max_lag]
+
+    def stats(self):
+        return {
+            "head": self.head,
+            "delivered_upto": self.delivered_upto(),
+            "window": len(self.window),
+            "subscribers": len(self.subscribers),
+        }
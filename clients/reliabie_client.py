@@ -1,52 +1,114 @@
 from email import message
+import itertools
 import threading
+import uuid
 from clients.client import LoggingClient
+from clients.dedup import DedupWindow
 from clients import reliable_prefixes
 
 
 class ReliableClient(LoggingClient):
 
-    def __init__(self, client_id, broker, logs_dir):
+    def __init__(self, client_id, broker, logs_dir, dedup_window=100000,
+                 dedup_ttl=None, dedup_bloom_bits=0, ack_timeout=1.0):
         super().__init__(client_id, broker, logs_dir)
         self.client_id = client_id
+        # Seconds to wait for an ACK before retransmitting (None: forever).
+        # Covers orders lost in flight, e.g. when a repository crashes
+        self.ack_timeout = ack_timeout
+        self.retransmits = 0
+        # Message IDs are unique per client instance, so a restarted client
+        # never collides with IDs still in a repository's dedup window
+        self._id_prefix = f"{client_id}-{uuid.uuid4().hex[:8]}"
+        self._msg_ids = itertools.count(1)
+        # Archived messages already delivered to this subscriber
+        self.dedup = DedupWindow(dedup_window, dedup_ttl, dedup_bloom_bits)
+        self._dedup_lock = threading.Lock()
 
-    def on_pnak(self, channel, message, base, base_msg):
+    @staticmethod
+    def _is_reply_for(message, msg_id):
+        """Repository replies start with the ID of the order they answer."""
+        return message.partition(reliable_prefixes.FIELD_SEP)[0] == msg_id
+
+    def on_pnak(self, channel, message, base, base_msg, msg_id=None):
+        if msg_id and not self._is_reply_for(message, msg_id):
+            return
         super().log_to_notification_file(
             f"Received NAK from Repository for message: \"{base_msg}\"")
         super().publish(base + reliable_prefixes.P_RETRANSMIT, base_msg)
 
-    def handle_ack(self, channel, message, ack_event, base_msg):
+    def handle_ack(self, channel, message, ack_event, base_msg, msg_id=None):
+        if msg_id and not self._is_reply_for(message, msg_id):
+            return
         super().log_to_notification_file(
             f"Received ACK from Repository for message: \"{base_msg}\"")
         ack_event.set()
 
     def publish(self, channel, message):
         ack_event = threading.Event()
+        msg_id = f"{self._id_prefix}:{next(self._msg_ids)}"
+        message = f"{msg_id}{reliable_prefixes.FIELD_SEP}{message}"
 
         nak_channel = channel + reliable_prefixes.P_NAK
         ack_channel = channel + reliable_prefixes.P_ACK
 
         super().subscribe(nak_channel, lambda channel,
-                          message, base=channel, base_msg=message: self.on_pnak(channel, message, base, base_msg))
+                          message, base=channel, base_msg=message, msg_id=msg_id: self.on_pnak(channel, message, base, base_msg, msg_id))
         super().subscribe(ack_channel, lambda channel, message,
-                          self=self, ack_event=ack_event, base_msg=message: self.handle_ack(channel, message, ack_event, base_msg))
+                          self=self, ack_event=ack_event, base_msg=message, msg_id=msg_id: self.handle_ack(channel, message, ack_event, base_msg, msg_id))
 
         # Logging-enhanced publish
         super().publish(channel + reliable_prefixes.ORDER, message)
 
-        # Wait for ACK
-        ack_event.wait()
+        # Wait for ACK; on timeout the order or its ACK was lost, so
+        # retransmit (the repository de-duplicates by message ID)
+        while not ack_event.wait(self.ack_timeout):
+            self.retransmits += 1
+            super().log_to_notification_file(
+                f"ACK timeout, retransmitting message: \"{message}\"")
+            super().publish(channel + reliable_prefixes.P_RETRANSMIT, message)
 
         # Clean up
         super().unsubscribe(nak_channel)
         super().unsubscribe(ack_channel)
 
-    def reliable_subscriber_callback(self, channel, message, base):
-        super().log_to_notification_file(base)
+    def reliable_subscriber_callback(self, channel, message, base, cb=None):
+        try:
+            epoch, seq, msg_id, message = message.split(reliable_prefixes.FIELD_SEP, 3)
+        except ValueError:
+            return
+        # Duplicates are ACKed again (the first ACK may be lost) but not
+        # delivered twice
+        with self._dedup_lock:
+            duplicate = self.dedup.seen(msg_id)
+            if not duplicate:
+                self.dedup.add(msg_id)
+        if not duplicate:
+            super().log_to_notification_file(base)
+            if cb:
+                cb(base, message)
+        super().publish(base + reliable_prefixes.S_ACK,
+                        reliable_prefixes.FIELD_SEP.join((epoch, seq, self.client_id,
+                            f"ACK from {self.client_id} to Repository for message \"{message}\"")))
+
+    def redelivery_callback(self, channel, message, base, cb=None):
+        """Archived frames the repository re-sends to one subscriber."""
+        subscriber, _, frame = message.partition(reliable_prefixes.FIELD_SEP)
+        if subscriber == self.client_id:
+            self.reliable_subscriber_callback(channel, frame, base, cb)
+
+    def announce(self, base):
+        """Tell the repository this client subscribes to base."""
         super().publish(base + reliable_prefixes.S_ACK,
-                        f"ACK from {self.client_id} to Repository for message \"{message}\"")
+                        reliable_prefixes.FIELD_SEP.join(("", reliable_prefixes.JOIN_SEQ, self.client_id,
+                            f"{self.client_id} subscribed to {base}")))
 
-    def subscribe(self, channel):
+    def subscribe(self, channel, cb=None):
         super().log_to_notification_file(f"Subscribed to {channel}")
         super().subscribe(channel + reliable_prefixes.ARCHIVED,
-                          lambda channel, message, base=channel, self=self: self.reliable_subscriber_callback(channel, message, base))
+                          lambda channel, message, base=channel, self=self, cb=cb: self.reliable_subscriber_callback(channel, message, base, cb))
+        super().subscribe(channel + reliable_prefixes.S_RETRANSMIT,
+                          lambda channel, message, base=channel, cb=cb: self.redelivery_callback(channel, message, base, cb))
+        super().subscribe(channel + reliable_prefixes.SYNC,
+                          lambda channel, message, base=channel: self.announce(base))
+        self.announce(channel)
@@ -15,3 +15,41 @@ SYNC = "/R2S-Sync"
 # From Subscriber
 S_ACK = "/S2R-ACK"
 S_NAK = "/S2R-NAK"
+
+# Header fields are "|"-separated ahead of the payload:
+# ORDER/P_RETRANSMIT "<msg id>|<message>", P_ACK/P_NAK "<msg id>|<text>",
+# ARCHIVED "<epoch>|<seq>|<msg id>|<message>",
+# S_ACK "<epoch>|<seq>|<subscriber id>|<text>",
+# S_RETRANSMIT "<subscriber id>|<ARCHIVED frame>"
+# The epoch names the owner (and claim) that numbered the seq; an S_ACK is
+# echoed with the epoch of the frame it acknowledges.
+FIELD_SEP = "|"
+# S_ACK seq announcing a subscriber (sent on subscribe and in reply to SYNC,
+# with an empty epoch)
+JOIN_SEQ = "0"
+
+
+# Multiplexed mode: each sub-channel above travels on one wire channel per
+# direction, tagged with a one-character frame type.
+# { sub-channel: (wire channel, frame tag) }
+MUX_ROUTES = {
+    ORDER: ("/P2R", "O"),
+    P_RETRANSMIT: ("/P2R", "T"),
+    P_NAK: ("/R2P", "N"),
+    P_ACK: ("/R2P", "A"),
+    ARCHIVED: ("/R2S", "F"),
+    RECTIFY: ("/R2S", "R"),
+    S_RETRANSMIT: ("/R2S", "T"),
+    SYNC: ("/R2S", "S"),
+    S_ACK: ("/S2R", "A"),
+    S_NAK: ("/S2R", "N"),
+}
+
+# Every suffix a reliable sub-channel name ends with, on its own or
+# multiplexed; stripping one gives the topic it belongs to
+SUFFIXES = (ORDER, P_RETRANSMIT, P_NAK, P_ACK, ARCHIVED, RECTIFY,
+            S_RETRANSMIT, SYNC, S_ACK, S_NAK) + tuple(
+    sorted({wire for wire, _ in MUX_ROUTES.values()}))
+
+# Between repository instances (group-wide, not per topic)
+REPO_HEARTBEAT = "__repository__/R2R-Heartbeat"
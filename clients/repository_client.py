@@ -1,43 +1,211 @@
+import collections
 import datetime
+import hashlib
+import itertools
 import os
 import random
+import threading
+import time
+import uuid
 from message_brokers.message_broker import MessageBroker
 from clients import reliable_prefixes
 from clients.client import LoggingClient
+from clients.dedup import DedupWindow
+from clients.delivery_tracker import DeliveryTracker
 
 ###################################
 # Repository Client Module        #
 ###################################
 
 """
-The repository client is a special client that ensures the reliable delivery of messages. 
+The repository client is a special client that ensures the reliable delivery of messages.
+
+Several repository instances can share the load: each instance heartbeats on
+REPO_HEARTBEAT, and every channel is owned by exactly one live instance,
+chosen by rendezvous hashing over the instances currently alive. When an
+instance stops heartbeating for failover_timeout seconds the others drop it
+and its channels move to their next-ranked owner.
+
+A starting instance heartbeats "join" while it learns its peers, claims its
+channels, and only then heartbeats "alive". Peers count it as a member (and
+release the channels it takes over) on its first "alive", so every channel
+always has at least one instance serving it; the brief overlap is harmless
+because orders are de-duplicated.
+
+Forwarded messages carry a per-channel sequence number, and subscribers ACK
+by sequence number on S_ACK. Subscribers announce themselves with a JOIN_SEQ
+ACK when they subscribe and whenever an owner asks on SYNC. A DeliveryTracker per owned channel records
+which subscribers have which messages. The archive is trimmed up to the
+"fully delivered" watermark. Sequence numbers are per owner, so a channel's
+tracker and archive start over when it changes hands. Each claim gets a new
+epoch that ARCHIVED frames carry and S_ACKs echo; ACKs for another owner's
+numbering (e.g. while two instances overlap during a handover) are ignored.
+
+The archive serves redelivery: when a subscriber's ACKs run redeliver_lag
+seqs past a seq it has not ACKed, that frame was (most likely) lost and is
+sent again to that subscriber on S_RETRANSMIT, at most once per
+redeliver_lag ACKs. A frame lost at the very end of a burst is therefore
+redelivered once traffic resumes.
+
+Orders carry a publisher-assigned message ID. A bounded DedupWindow of the
+IDs already archived makes retransmits idempotent: a duplicate is ACKed to
+the publisher again but not archived or forwarded a second time.
 """
 
 
+def rendezvous_owner(members, channel):
+    """The member with the highest hash for this channel owns it."""
+    return max(members, key=lambda member: hashlib.md5(
+        f"{member}/{channel}".encode("utf-8")).digest())
+
+
 class RepositoryClient(LoggingClient):
 
-    def __init__(self, client_id, broker, logs_dir, fault_probabillity=0.05):
+    def __init__(self, client_id, broker, logs_dir, fault_probabillity=0.05,
+                 heartbeat_interval=None, failover_timeout=None,
+                 max_window=65536, dedup_window=100000, dedup_ttl=None,
+                 dedup_bloom_bits=0, redeliver_lag=8):
         super().__init__(client_id, broker, logs_dir)
         self.client_id = client_id
         self.fault_prob = fault_probabillity
 
+        # Channels served by the repository group / handled by this instance
+        self.channels = set()
+        self.owned = set()
+
+        # Per-channel delivery state: { channel: DeliveryTracker } and
+        # { channel: deque of (seq, ARCHIVED frame) not yet fully delivered }
+        self.max_window = max_window
+        self.trackers = {}
+        self.archive = {}
+        # { channel: { subscriber: ACKed seq that last triggered a redelivery } }
+        self.redeliver_lag = redeliver_lag
+        self._redelivered = {}
+        self.epochs = {}  # { channel: epoch of this instance's claim }
+        # Epochs are unique per instance, so a restarted instance never
+        # accepts ACKs meant for its previous run
+        self._epoch_prefix = f"{client_id}-{uuid.uuid4().hex[:8]}"
+        self._epoch_ids = itertools.count(1)
+        self.dedup = DedupWindow(dedup_window, dedup_ttl, dedup_bloom_bits)
+        self._msg_ids = itertools.count(1)
+
+        # Partitioning is off unless a heartbeat interval is given
+        self.heartbeat_interval = heartbeat_interval
+        self.failover_timeout = failover_timeout or (
+            3 * heartbeat_interval if heartbeat_interval else None)
+        self.members = {client_id: time.monotonic()}  # { id: last seen }
+        self._joined = heartbeat_interval is None
+        self._lock = threading.RLock()
+        self._stop_evt = threading.Event()
+        self._heartbeat_thread = None
+
     def publish(self, channel, message):
-        ack_channel = channel + reliable_prefixes.S_ACK
-        super().publish(channel + reliable_prefixes.ARCHIVED, message)
+        self._archive(channel, f"{self.client_id}:{next(self._msg_ids)}", message)
+
+    def _tracker(self, channel):
+        with self._lock:
+            tracker = self.trackers.get(channel)
+            if tracker is None:
+                tracker = self.trackers[channel] = DeliveryTracker(
+                    max_window=self.max_window)
+                self.archive[channel] = collections.deque()
+                self._redelivered[channel] = {}
+                self.epochs[channel] = f"{self._epoch_prefix}.{next(self._epoch_ids)}"
+            return tracker
+
+    def _archive(self, channel, msg_id, message):
+        """Number a message, keep it until fully delivered and forward it."""
+        with self._lock:
+            seq = self._tracker(channel).issue()
+            frame = reliable_prefixes.FIELD_SEP.join(
+                (self.epochs[channel], str(seq), msg_id, message))
+            self.archive[channel].append((seq, frame))
+            self._trim_archive(channel)
+        super().publish(channel + reliable_prefixes.ARCHIVED, frame)
+
+    def s_ack_callback(self, channel, message, base):
+        try:
+            epoch, seq, subscriber, _ = message.split(reliable_prefixes.FIELD_SEP, 3)
+            seq = int(seq)
+        except ValueError:
+            return
+        with self._lock:
+            tracker = self._tracker(base)
+            if seq == int(reliable_prefixes.JOIN_SEQ):
+                tracker.join(subscriber)
+                return
+            # Another owner's seq k is not our seq k
+            if epoch != self.epochs[base] or not tracker.ack(subscriber, seq):
+                return
+            self._trim_archive(base)
+            frames = self._lost_frames(base, subscriber, seq)
+        for frame in frames:
+            super().publish(base + reliable_prefixes.S_RETRANSMIT,
+                            reliable_prefixes.FIELD_SEP.join((subscriber, frame)))
+
+    def _lost_frames(self, channel, subscriber, seq):
+        """Archived frames a subscriber lacks redeliver_lag seqs behind seq."""
+        marks = self._redelivered[channel]
+        if seq - marks.get(subscriber, 0) < self.redeliver_lag:
+            return []
+        tracker = self.trackers[channel]
+        missing = tracker.missing(subscriber, seq - self.redeliver_lag)
+        if not missing:
+            return []
+        marks[subscriber] = seq
+        if len(marks) > 2 * len(tracker.subscribers):
+            # Forget subscribers the tracker has dropped
+            for gone in [s for s in marks if s not in tracker.subscribers]:
+                del marks[gone]
+        # The archive holds every seq from its first entry on
+        archive = self.archive[channel]
+        first = archive[0][0] if archive else seq
+        return [archive[m - first][1] for m in missing
+                if 0 <= m - first < len(archive)]
+
+    def _trim_archive(self, channel):
+        """Drop archived messages every subscriber now has."""
+        with self._lock:
+            archive = self.archive[channel]
+            upto = self.trackers[channel].delivered_upto()
+            while archive and archive[0][0] <= upto:
+                archive.popleft()
+
+    def delivered_upto(self, channel):
+        """Highest seq on a channel that every subscriber has ACKed."""
+        with self._lock:
+            tracker = self.trackers.get(channel)
+            return tracker.delivered_upto() if tracker else 0
+
+    def lagging_subscribers(self, channel, max_lag):
+        """Subscribers more than max_lag messages behind on a channel."""
+        with self._lock:
+            tracker = self.trackers.get(channel)
+            return tracker.lagging(max_lag) if tracker else []
 
     def repo_subscriber_callback(self, channel, message, base):
-        fault_score = random.random()
+        msg_id, _, message = message.partition(reliable_prefixes.FIELD_SEP)
+        sep = reliable_prefixes.FIELD_SEP
 
-        if (fault_score > self.fault_prob):
+        with self._lock:
+            duplicate = self.dedup.seen(msg_id)
+            accepted = not duplicate and random.random() > self.fault_prob
+            if accepted:
+                self.dedup.add(msg_id)
+
+        if duplicate:
+            super().log_to_publish_file(f"Repository re-sending ACK for duplicate...")
+            super().publish(base + reliable_prefixes.P_ACK,
+                            f"{msg_id}{sep}Repository ACK for message: \"{message}\"")
+        elif accepted:
             super().log_to_publish_file(f"Repository Sending ACK...")
             super().publish(base + reliable_prefixes.P_ACK,
-                            f"Repository ACK for message: \"{message}\"")
-            super().publish(base + reliable_prefixes.ARCHIVED,
-                            f"Repository forwarded message: \"{message}\"")
+                            f"{msg_id}{sep}Repository ACK for message: \"{message}\"")
+            self._archive(base, msg_id, f"Repository forwarded message: \"{message}\"")
         else:
             super().log_to_publish_file(f"Repository Sending PNAK...")
             super().publish(base + reliable_prefixes.P_NAK,
-                            f"Repository PNAK for message: \"{message}\"")
+                            f"{msg_id}{sep}Repository PNAK for message: \"{message}\"")
 
     def order_callback(self, channel, message, base):
         super().log_to_publish_file(f"Received P2R-Order...")
@@ -49,7 +217,126 @@ class RepositoryClient(LoggingClient):
 
     def subscribe(self, channel):
         super().log_to_notification_file(f"Subscribed to {channel}")
+        with self._lock:
+            self.channels.add(channel)
+            self._rebalance()
+
+    ###################################
+    # Channel ownership               #
+    ###################################
+
+    def _claim(self, channel):
+        super().log_to_notification_file(f"Taking ownership of {channel}")
         super().subscribe(channel + reliable_prefixes.ORDER,
                           lambda channel, message, base=channel: self.order_callback(channel, message, base))
         super().subscribe(channel + reliable_prefixes.P_RETRANSMIT,
                           lambda channel, message, base=channel, self=self: self.retransmit_callback(channel, message, base))
+        self.broker.subscribe(channel + reliable_prefixes.S_ACK,
+                              lambda channel, message, base=channel: self.s_ack_callback(channel, message, base))
+        # Ask the channel's subscribers to (re-)announce themselves
+        self._tracker(channel)
+        super().publish(channel + reliable_prefixes.SYNC, self.client_id)
+
+    def _release(self, channel):
+        super().log_to_notification_file(f"Releasing ownership of {channel}")
+        super().unsubscribe(channel + reliable_prefixes.ORDER)
+        super().unsubscribe(channel + reliable_prefixes.P_RETRANSMIT)
+        super().unsubscribe(channel + reliable_prefixes.S_ACK)
+        with self._lock:
+            self.trackers.pop(channel, None)
+            self.archive.pop(channel, None)
+            self._redelivered.pop(channel, None)
+            self.epochs.pop(channel, None)
+
+    def _rebalance(self):
+        """Claim and release channels to match the current membership."""
+        with self._lock:
+            if not self._joined:
+                return
+            owned = {channel for channel in self.channels
+                     if rendezvous_owner(self.members, channel) == self.client_id}
+            for channel in sorted(owned - self.owned):
+                self._claim(channel)
+            for channel in sorted(self.owned - owned):
+                self._release(channel)
+            self.owned = owned
+
+    ###################################
+    # Heartbeats and failover         #
+    ###################################
+
+    def start(self):
+        """
+        Join the repository group: heartbeat for one interval to learn the
+        live peers, then claim this instance's channels. Call once the
+        broker listener is running. No-op when partitioning is off.
+        """
+        if self.heartbeat_interval is None or self._heartbeat_thread:
+            return
+        self.broker.subscribe(reliable_prefixes.REPO_HEARTBEAT,
+                              self.heartbeat_callback)
+        self._heartbeat_thread = threading.Thread(
+            target=self._heartbeat_loop, daemon=True)
+        self._heartbeat_thread.start()
+        self._send_heartbeat()
+        time.sleep(self.heartbeat_interval)
+        with self._lock:
+            self._joined = True
+            self._rebalance()
+        # Channels are claimed; now let the previous owners hand them over
+        self._send_heartbeat()
+
+    def stop(self):
+        """Leave the group so peers take over our channels immediately."""
+        if self._heartbeat_thread is None:
+            return
+        self._stop_evt.set()
+        self._heartbeat_thread.join(self.heartbeat_interval)
+        self._heartbeat_thread = None
+        self.broker.publish(reliable_prefixes.REPO_HEARTBEAT,
+                            f"leave:{self.client_id}")
+        # Keep serving while the peers take over
+        time.sleep(self.heartbeat_interval)
+        with self._lock:
+            for channel in sorted(self.owned):
+                self._release(channel)
+            self.owned = set()
+            self._joined = False
+
+    def _send_heartbeat(self):
+        kind = "alive" if self._joined else "join"
+        self.broker.publish(reliable_prefixes.REPO_HEARTBEAT,
+                            f"{kind}:{self.client_id}")
+
+    def _heartbeat_loop(self):
+        while not self._stop_evt.wait(self.heartbeat_interval):
+            self._send_heartbeat()
+            now = time.monotonic()
+            with self._lock:
+                self.members[self.client_id] = now
+                dead = [member for member, seen in self.members.items()
+                        if now - seen > self.failover_timeout]
+                for member in dead:
+                    del self.members[member]
+                    super().log_to_notification_file(
+                        f"Repository {member} timed out")
+                if dead:
+                    self._rebalance()
+
+    def heartbeat_callback(self, channel, message):
+        kind, _, member = message.partition(":")
+        # "join" heartbeats are ignored: a member owns nothing until it has
+        # claimed its channels and says "alive"
+        if member == self.client_id or kind == "join":
+            return
+        with self._lock:
+            if kind == "leave":
+                if self.members.pop(member, None) is not None:
+                    self._rebalance()
+            elif kind == "alive":
+                is_new = member not in self.members
+                self.members[member] = time.monotonic()
+                if is_new:
+                    super().log_to_notification_file(
+                        f"Repository {member} joined")
+                    self._rebalance()
@@ -0,0 +1,205 @@
+import collections
+import pickle
+import tempfile
+import threading
+import time
+
+###################################
+# Bounded Dispatch Queue Module   #
+###################################
+
+BLOCK = "block"
+DROP_OLDEST = "drop_oldest"
+DROP_NEWEST = "drop_newest"
+SPILL = "spill"
+
+POLICIES = (BLOCK, DROP_OLDEST, DROP_NEWEST, SPILL)
+
+
+class DispatchQueue:
+    """
+    Bounded FIFO between a broker's reader and one subscription callback.
+
+    The reader calls put(); a dedicated worker thread drains the queue and
+    runs the callback. Once high_watermark messages are queued the overflow
+    policy applies:
+    - block:       put() stalls the reader until depth falls to low_watermark
+    - drop_oldest: the oldest queued message is discarded
+    - drop_newest: the incoming message is discarded
+    - spill:       messages are appended to a temp file and read back once
+                   depth falls to low_watermark (ordering is preserved)
+
+    detach() parks the queue (and its worker) without a callback and
+    attach() gives it a new one, so a broker can reuse one worker for a
+    channel that is subscribed and unsubscribed over and over.
+    """
+
+    def __init__(self, callback, high_watermark=1000, low_watermark=None,
+                 policy=BLOCK, spill_dir=None, name=None):
+        if policy not in POLICIES:
+            raise ValueError(f"Unsupported dispatch policy: {policy}")
+        if high_watermark < 1:
+            raise ValueError("high_watermark must be at least 1")
+        if low_watermark is None:
+            low_watermark = high_watermark // 2
+        if not 0 <= low_watermark < high_watermark:
+            raise ValueError("low_watermark must be in [0, high_watermark)")
+
+        self.callback = callback
+        self.high = high_watermark
+        self.low = low_watermark
+        self.policy = policy
+        self.spill_dir = spill_dir
+        self.name = name
+
+        self._queue = collections.deque()
+        self._cond = threading.Condition()
+        self._paused = False
+        self._closed = False
+        # Spill file: appended at _spill_wpos, read back from _spill_rpos
+        self._spill_file = None
+        self._spill_wpos = 0
+        self._spill_rpos = 0
+        self._spill_pending = 0
+
+        # Counters
+        self.enqueued = 0
+        self.delivered = 0
+        self.dropped = 0
+        self.spilled = 0
+        self.stall_time = 0.0
+        self.max_depth = 0
+
+        self._thread = threading.Thread(target=self._worker, daemon=True)
+        self._thread.start()
+
+    def put(self, channel, message):
+        """Enqueue a message, applying the overflow policy at the high watermark."""
+        with self._cond:
+            if self._closed or self.callback is None:
+                return
+            self.enqueued += 1
+            # While a spill backlog exists new messages go behind it
+            if self._spill_pending:
+                self._spill(channel, message)
+                return
+            if len(self._queue) >= self.high:
+                if self.policy == BLOCK:
+                    t0 = time.perf_counter()
+                    self._paused = True
+                    while self._paused and not self._closed:
+                        self._cond.wait()
+                    self.stall_time += time.perf_counter() - t0
+                    if self._closed or self.callback is None:
+                        return
+                elif self.policy == DROP_OLDEST:
+                    self._queue.popleft()
+                    self.dropped += 1
+                elif self.policy == DROP_NEWEST:
+                    self.dropped += 1
+                    return
+                else:
+                    self._spill(channel, message)
+                    return
+            self._queue.append((channel, message))
+            self.max_depth = max(self.max_depth, len(self._queue))
+            self._cond.notify_all()
+
+    def _spill(self, channel, message):
+        if self._spill_file is None:
+            self._spill_file = tempfile.TemporaryFile(dir=self.spill_dir)
+        self._spill_file.seek(self._spill_wpos)
+        pickle.dump((channel, message), self._spill_file)
+        self._spill_wpos = self._spill_file.tell()
+        self._spill_pending += 1
+        self.spilled += 1
+
+    def _unspill(self):
+        """Move spilled messages back into memory up to the high watermark."""
+        self._spill_file.seek(self._spill_rpos)
+        while self._spill_pending and len(self._queue) < self.high:
+            self._queue.append(pickle.load(self._spill_file))
+            self._spill_pending -= 1
+        self._spill_rpos = self._spill_file.tell()
+        if not self._spill_pending:
+            # Backlog drained; reuse the file from the start
+            self._reset_spill()
+
+    def _reset_spill(self):
+        self._spill_file.seek(0)
+        self._spill_file.truncate()
+        self._spill_wpos = self._spill_rpos = 0
+        self._spill_pending = 0
+
+    def _worker(self):
+        while True:
+            with self._cond:
+                while not self._queue and not self._closed:
+                    if self._spill_pending:
+                        self._unspill()
+                    else:
+                        self._cond.wait()
+                if self._closed:
+                    return
+                channel, message = self._queue.popleft()
+                callback = self.callback
+                if len(self._queue) <= self.low:
+                    if self._paused:
+                        self._paused = False
+                        self._cond.notify_all()
+                    if self._spill_pending:
+                        self._unspill()
+            if callback is None:
+                continue
+            try:
+                callback(channel, message)
+            except Exception as e:
+                print(f"[DispatchQueue] callback error on '{channel}': {e}")
+            self.delivered += 1
+
+    def depth(self):
+        """Messages waiting in memory and on disk."""
+        with self._cond:
+            return len(self._queue) + self._spill_pending
+
+    def stats(self):
+        with self._cond:
+            return {
+                "depth": len(self._queue),
+                "spill_depth": self._spill_pending,
+                "max_depth": self.max_depth,
+                "enqueued": self.enqueued,
+                "delivered": self.delivered,
+                "dropped": self.dropped,
+                "spilled": self.spilled,
+                "stall_time": self.stall_time,
+            }
+
+    def detach(self):
+        """Discard anything queued and drop new messages until attach()."""
+        with self._cond:
+            self.callback = None
+            self._queue.clear()
+            if self._spill_file is not None:
+                self._reset_spill()
+            # Release a reader blocked on the old subscription
+            self._paused = False
+            self._cond.notify_all()
+
+    def attach(self, callback):
+        """Resume delivering, to callback, after detach()."""
+        with self._cond:
+            self.callback = callback
+
+    def close(self, timeout=1.0):
+        """Stop the worker, discard anything still queued and join the worker."""
+        with self._cond:
+            self._closed = True
+            self._queue.clear()
+            self._cond.notify_all()
+            if self._spill_file is not None:
+                self._spill_file.close()
+                self._spill_file = None
+                self._spill_pending = 0
+        if threading.current_thread() is not self._thread:
+            self._thread.join(timeout)
@@ -1,25 +1,179 @@
-from .redis_broker import RedisMessageBroker
-from .streams_broker import RedisStreamsBroker
-from .rabbitmq_broker import RabbitMQBroker
-from .kafka_broker import KafkaBroker
-
-def get_broker(cfg: dict):
-    t = cfg["type"]
-    if t == "redis":
-        return RedisMessageBroker(host=cfg["host"], port=cfg["port"])
-    elif t == "redis_streams":
-        return RedisStreamsBroker(host=cfg["host"], port=cfg["port"])
-    elif t == "rabbitmq":
-        return RabbitMQBroker(
-            host=cfg["host"],
-            port=cfg["port"],
-            username=cfg["username"],
-            password=cfg["password"],
-            vhost=cfg.get("vhost", "/")
-        )
-    elif t == "kafka":
-        return KafkaBroker(
-            bootstrap_servers=cfg["bootstrap_servers"]
-        )
-    else:
-        raise ValueError(f"Unsupported broker type: {t}")
\ No newline at end of file
+import threading
+from .message_broker import MessageBroker
+
+###################################
+# Backend Registry                #
+###################################
+
+# Third-party backends register a builder under this entry point group:
+#   [project.entry-points."message_brokers.backends"]
+#   nats = "my_pkg.nats_broker:build"
+# A builder is called as builder(cfg, binary) and returns a MessageBroker.
+ENTRY_POINT_GROUP = "message_brokers.backends"
+
+# Built-in builders import their client library only when called, so a
+# Redis-only process never imports pika or kafka-python.
+
+def _redis(cfg, binary):
+    from .redis_broker import RedisMessageBroker
+    return RedisMessageBroker(host=cfg["host"], port=cfg["port"],
+                              dispatch=cfg.get("dispatch"),
+                              binary=binary)
+
+def _redis_streams(cfg, binary):
+    from .streams_broker import RedisStreamsBroker
+    return RedisStreamsBroker(host=cfg["host"], port=cfg["port"],
+                              dispatch=cfg.get("dispatch"),
+                              binary=binary)
+
+def _rabbitmq(cfg, binary):
+    from .rabbitmq_broker import RabbitMQBroker
+    return RabbitMQBroker(
+        host=cfg["host"],
+        port=cfg["port"],
+        username=cfg["username"],
+        password=cfg["password"],
+        vhost=cfg.get("vhost", "/"),
+        dispatch=cfg.get("dispatch"),
+        binary=binary
+    )
+
+def _kafka(cfg, binary):
+    from .kafka_broker import KafkaBroker
+    return KafkaBroker(
+        bootstrap_servers=cfg["bootstrap_servers"],
+        dispatch=cfg.get("dispatch"),
+        binary=binary
+    )
+
+def _sharded(cfg, binary):
+    from .sharded_broker import ShardedBroker
+    # Each shard is a full broker config of its own
+    shards = {}
+    for i, shard_cfg in enumerate(cfg["shards"]):
+        name = shard_cfg.get("name", f"shard-{i}")
+        shards[name] = get_broker(dict(shard_cfg, binary=binary))
+    return ShardedBroker(shards, vnodes=cfg.get("vnodes", 100))
+
+_backends = {
+    "redis": _redis,
+    "redis_streams": _redis_streams,
+    "rabbitmq": _rabbitmq,
+    "kafka": _kafka,
+    "sharded": _sharded,
+}
+_entry_points_loaded = False
+_registry_lock = threading.Lock()
+
+def register_backend(name, builder):
+    """Register builder(cfg, binary) -> MessageBroker for broker type name."""
+    with _registry_lock:
+        _backends[name] = builder
+
+def _load_entry_points():
+    global _entry_points_loaded
+    with _registry_lock:
+        if _entry_points_loaded:
+            return
+        _entry_points_loaded = True
+        # importlib.metadata is slow to import; only pay for it when needed
+        from importlib import metadata
+        try:
+            eps = metadata.entry_points(group=ENTRY_POINT_GROUP)
+        except TypeError:
+            # Python < 3.10
+            eps = metadata.entry_points().get(ENTRY_POINT_GROUP, [])
+        for ep in eps:
+            # Built-ins and explicit registrations win over entry points
+            if ep.name not in _backends:
+                _backends[ep.name] = (
+                    lambda cfg, binary, ep=ep: ep.load()(cfg, binary))
+
+def _builder(t):
+    if t not in _backends:
+        _load_entry_points()
+    builder = _backends.get(t)
+    if builder is None:
+        raise ValueError(f"Unsupported broker type: {t}")
+    return builder
+
+def available_backends():
+    """Names of every built-in, registered and installed backend."""
+    _load_entry_points()
+    return sorted(_backends)
+
+###################################
+# Broker Construction             #
+###################################
+
+class LazyBroker(MessageBroker):
+    """
+    Defers building a broker (and opening its connections) until the first
+    call that needs it. Anything beyond the MessageBroker interface (e.g.
+    ShardedBroker.add_shard or .shards) is forwarded to the built broker.
+    """
+
+    def __init__(self, build):
+        self._build = build
+        self._broker = None
+        self._lock = threading.Lock()
+
+    @property
+    def broker(self):
+        if self._broker is None:
+            with self._lock:
+                if self._broker is None:
+                    self._broker = self._build()
+        return self._broker
+
+    def __getattr__(self, name):
+        # Only called for attributes LazyBroker itself lacks; private names
+        # are never forwarded, so a half-built wrapper cannot recurse
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.broker, name)
+
+    def publish(self, channel, message):
+        self.broker.publish(channel, message)
+
+    def subscribe(self, channel, callback=None):
+        self.broker.subscribe(channel, callback)
+
+    def unsubscribe(self, channel):
+        self.broker.unsubscribe(channel)
+
+    def start_listener(self):
+        self.broker.start_listener()
+
+    def dispatch_stats(self):
+        return self._broker.dispatch_stats() if self._broker else {}
+
+    def close(self, *args, **kwargs):
+        if self._broker is not None and hasattr(self._broker, "close"):
+            self._broker.close(*args, **kwargs)
+
+def get_broker(cfg: dict, lazy=None):
+    """
+    Build the broker described by cfg. Unless cfg has "lazy": false (or
+    lazy=False is passed) a LazyBroker is returned and nothing is imported
+    or connected until first use. A "codecs" block switches the backend to
+    binary mode and wraps it in a CodecBroker:
+        "codecs": {"default": "utf8",
+                   "channels": {"telemetry*": {"codec": "json",
+                                               "compress_threshold": 1024}}}
+    """
+    if lazy is None:
+        lazy = cfg.get("lazy", True)
+    # Fail fast on unknown types even when construction is deferred
+    _builder(cfg["type"])
+    if lazy:
+        return LazyBroker(lambda: get_broker(cfg, lazy=False))
+
+    codecs = cfg.get("codecs")
+    broker = _builder(cfg["type"])(cfg, cfg.get("binary", bool(codecs)))
+    if codecs:
+        from .payload_codecs import CodecBroker
+        broker = CodecBroker(broker,
+                             channels=codecs.get("channels"),
+                             default=codecs.get("default", "utf8"))
+    return broker
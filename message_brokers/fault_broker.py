@@ -0,0 +1,220 @@
+import fnmatch
+import heapq
+import itertools
+import random
+import threading
+import time
+from .message_broker import MessageBroker
+
+###################################
+# Fault Injection Broker Wrapper  #
+###################################
+
+
+class FaultSpec:
+    """
+    Faults applied to the channels matching one pattern.
+
+    drop, duplicate and reorder are per-message probabilities. delay is a
+    distribution in seconds: {"dist": "constant", "value": s},
+    {"dist": "uniform", "low": a, "high": b}, {"dist": "exponential",
+    "mean": m} or {"dist": "normal", "mean": m, "stddev": s}. A reordered
+    message is held back for up to reorder_window seconds extra.
+    partitions lists [start, end] windows, in seconds after the wrapper is
+    created, during which the channel neither sends nor delivers.
+    """
+
+    def __init__(self, drop=0.0, duplicate=0.0, reorder=0.0,
+                 reorder_window=0.05, delay=None, partitions=()):
+        if delay and delay.get("dist") not in (
+                "constant", "uniform", "exponential", "normal"):
+            raise ValueError(f"Unsupported delay distribution: {delay.get('dist')}")
+        self.drop = drop
+        self.duplicate = duplicate
+        self.reorder = reorder
+        self.reorder_window = reorder_window
+        self.delay = delay
+        self.partitions = [tuple(window) for window in partitions]
+
+    def sample_delay(self, rng):
+        d = self.delay
+        if not d:
+            return 0.0
+        if d["dist"] == "constant":
+            return d["value"]
+        if d["dist"] == "uniform":
+            return rng.uniform(d["low"], d["high"])
+        if d["dist"] == "exponential":
+            return rng.expovariate(1.0 / d["mean"]) if d["mean"] > 0 else 0.0
+        return max(0.0, rng.gauss(d["mean"], d["stddev"]))
+
+
+class FaultInjectingBroker(MessageBroker):
+    """
+    Wraps any MessageBroker and drops, delays, duplicates and reorders
+    published messages per channel, and cuts channels off entirely during
+    partition windows. Random decisions come from one seeded RNG, so a
+    given seed and call order always yields the same faults.
+
+    faults maps fnmatch patterns to FaultSpec keyword dicts (or FaultSpec
+    objects); the first matching pattern wins and unmatched channels are
+    left alone.
+    """
+
+    def __init__(self, broker: MessageBroker, faults=None, seed=None):
+        self.broker = broker
+        self._specs = [(pattern, spec if isinstance(spec, FaultSpec)
+                        else FaultSpec(**spec))
+                       for pattern, spec in (faults or {}).items()]
+        self._rng = random.Random(seed)
+        self._rng_lock = threading.Lock()
+        self._t0 = time.monotonic()
+        # Runtime partitions: [(pattern, start, end)] in monotonic time
+        self._partitions = []
+        self._partition_lock = threading.Lock()
+
+        # Delayed messages: heap of (due, tiebreak, channel, message)
+        self._pending = []
+        self._tiebreak = itertools.count()
+        self._cond = threading.Condition()
+        self._stop_evt = threading.Event()
+        self._thread = threading.Thread(target=self._scheduler, daemon=True)
+        self._thread.start()
+
+        # Counters
+        self.published = 0
+        self.dropped = 0
+        self.duplicated = 0
+        self.delayed = 0
+        self.reordered = 0
+        self.partitioned = 0
+
+    def _spec_for(self, channel):
+        for pattern, spec in self._specs:
+            if fnmatch.fnmatchcase(channel, pattern):
+                return spec
+        return None
+
+    def _random(self):
+        with self._rng_lock:
+            return self._rng.random()
+
+    def partition(self, duration, pattern="*"):
+        """Cut off matching channels for duration seconds, starting now."""
+        now = time.monotonic()
+        with self._partition_lock:
+            self._partitions.append((pattern, now, now + duration))
+        return now + duration
+
+    def is_partitioned(self, channel):
+        now = time.monotonic()
+        partitions = self._partitions
+        if partitions:
+            # Forget runtime partitions that are over
+            if any(end <= now for _, _, end in partitions):
+                with self._partition_lock:
+                    self._partitions = partitions = [
+                        p for p in self._partitions if p[2] > now]
+            for pattern, start, end in partitions:
+                if start <= now < end and fnmatch.fnmatchcase(channel, pattern):
+                    return True
+        spec = self._spec_for(channel)
+        if spec and spec.partitions:
+            elapsed = now - self._t0
+            return any(start <= elapsed < end for start, end in spec.partitions)
+        return False
+
+    def publish(self, channel, message):
+        self.published += 1
+        if self.is_partitioned(channel):
+            self.partitioned += 1
+            return
+        spec = self._spec_for(channel)
+        if spec is None:
+            self.broker.publish(channel, message)
+            return
+        if self._random() < spec.drop:
+            self.dropped += 1
+            return
+        copies = 1
+        if self._random() < spec.duplicate:
+            self.duplicated += 1
+            copies = 2
+        for _ in range(copies):
+            with self._rng_lock:
+                delay = spec.sample_delay(self._rng)
+                if self._rng.random() < spec.reorder:
+                    self.reordered += 1
+                    delay += self._rng.uniform(0, spec.reorder_window)
+            if delay > 0:
+                self.delayed += 1
+                self._schedule(delay, channel, message)
+            else:
+                self.broker.publish(channel, message)
+
+    def _schedule(self, delay, channel, message):
+        with self._cond:
+            heapq.heappush(self._pending, (time.monotonic() + delay,
+                                           next(self._tiebreak), channel, message))
+            self._cond.notify()
+
+    def _scheduler(self):
+        while not self._stop_evt.is_set():
+            with self._cond:
+                while not self._pending and not self._stop_evt.is_set():
+                    self._cond.wait()
+                if self._stop_evt.is_set():
+                    return
+                due, _, channel, message = self._pending[0]
+                wait = due - time.monotonic()
+                if wait > 0:
+                    self._cond.wait(wait)
+                    continue
+                heapq.heappop(self._pending)
+            # A partition that began while the message was in flight eats it
+            if self.is_partitioned(channel):
+                self.partitioned += 1
+                continue
+            self.broker.publish(channel, message)
+
+    def subscribe(self, channel, callback=None):
+        if callback is None:
+            self.broker.subscribe(channel)
+            return
+
+        def _deliver(ch, message):
+            if self.is_partitioned(ch):
+                self.partitioned += 1
+                return
+            callback(ch, message)
+
+        self.broker.subscribe(channel, _deliver)
+
+    def unsubscribe(self, channel):
+        self.broker.unsubscribe(channel)
+
+    def start_listener(self):
+        self.broker.start_listener()
+
+    def fault_stats(self):
+        return {
+            "published": self.published,
+            "dropped": self.dropped,
+            "duplicated": self.duplicated,
+            "delayed": self.delayed,
+            "reordered": self.reordered,
+            "partitioned": self.partitioned,
+        }
+
+    def dispatch_stats(self):
+        return self.broker.dispatch_stats()
+
+    def close(self, *args, **kwargs):
+        """Stop the scheduler (dropping delayed messages) and close the broker."""
+        with self._cond:
+            self._stop_evt.set()
+            self._pending.clear()
+            self._cond.notify_all()
+        self._thread.join(1.0)
+        if hasattr(self.broker, "close"):
+            self.broker.close(*args, **kwargs)
@@ -5,15 +5,18 @@ from kafka import KafkaProducer, KafkaConsumer
 from .message_broker import MessageBroker
 
 class KafkaBroker(MessageBroker):
-    def __init__(self, bootstrap_servers):
+    def __init__(self, bootstrap_servers, dispatch=None, binary=False):
+        # binary=True passes bytes through untouched in both directions
+        self.binary = binary
         # Producer writes to sanitized topics
         self.producer = KafkaProducer(
             bootstrap_servers=bootstrap_servers,
-            value_serializer=lambda v: v.encode('utf-8')
+            value_serializer=lambda v: v if isinstance(v, bytes) else v.encode('utf-8')
         )
         # Map sanitized topic -> original channel
         self._topic_map = {}
         self.consumers = {}
+        self.dispatch_cfg = dispatch
 
     def _sanitize(self, channel: str) -> str:
         # Replace any char not in A-Za-z0-9._- with '_'
@@ -38,7 +41,7 @@ class KafkaBroker(MessageBroker):
             group_id=None,
             fetch_max_wait_ms=5,      # default 500
             enable_auto_commit=False,
-            value_deserializer=lambda v: v.decode('utf-8')
+            value_deserializer=None if self.binary else lambda v: v.decode('utf-8')
         )
         
         # kick off the assignment
@@ -50,6 +53,7 @@ class KafkaBroker(MessageBroker):
             print(f"[KafkaBroker] WARNING: no partitions assigned for topic '{topic}'")
 
         self.consumers[topic] = consumer
+        callback = self._dispatch(channel, callback)
 
         def _listen():
             try:
@@ -69,6 +73,7 @@ class KafkaBroker(MessageBroker):
         if topic in self.consumers:
             self.consumers[topic].close()
             del self.consumers[topic]
+        self._close_dispatch(channel)
 
     def start_listener(self):
         # KafkaConsumer threads handle polling; no global listener needed
@@ -1,5 +1,6 @@
-
 import abc
+import threading
+from .dispatch_queue import DispatchQueue
 
 
 ##############################
@@ -8,6 +9,9 @@ import abc
 
 
 class MessageBroker(abc.ABC):
+    # Guards the dispatch queue registries below
+    _dispatch_lock = threading.Lock()
+
     @abc.abstractmethod
     def unsubscribe(self, channel):
         """Unsubscribe from a channel"""
@@ -27,3 +31,56 @@ class MessageBroker(abc.ABC):
     def start_listener(self):
         """Start the background listener that dispatches messages."""
         pass
+
+    def _dispatch(self, channel, callback):
+        """
+        Put a bounded DispatchQueue between the reader and callback when the
+        broker has a dispatch config; otherwise return the callback as is.
+        """
+        cfg = getattr(self, "dispatch_cfg", None)
+        if not cfg or callback is None:
+            return callback
+        with self._dispatch_lock:
+            if not hasattr(self, "_dispatch_queues"):
+                self._dispatch_queues = {}
+                self._idle_dispatch = {}
+            # Reuse a queue parked by an earlier unsubscribe, so short-lived
+            # subscriptions (e.g. ReliableClient's per-publish ACK/NAK
+            # channels) do not start a worker thread each time
+            idle = self._idle_dispatch.get(channel)
+            if idle:
+                q = idle.pop()
+                q.attach(callback)
+            else:
+                q = DispatchQueue(callback, name=channel, **cfg)
+            self._dispatch_queues.setdefault(channel, []).append(q)
+        return q.put
+
+    def _close_dispatch(self, channel):
+        """Park the dispatch queues of a channel for its next subscribe."""
+        with self._dispatch_lock:
+            queues = getattr(self, "_dispatch_queues", {}).pop(channel, [])
+            for q in queues:
+                q.detach()
+                self._idle_dispatch.setdefault(channel, []).append(q)
+
+    def _shutdown_dispatch(self, timeout=1.0):
+        """Stop every dispatch queue, parked or not, and join the workers."""
+        with self._dispatch_lock:
+            queues = [q for qs in getattr(self, "_dispatch_queues", {}).values()
+                      for q in qs]
+            queues += [q for qs in getattr(self, "_idle_dispatch", {}).values()
+                       for q in qs]
+            self._dispatch_queues = {}
+            self._idle_dispatch = {}
+        for q in queues:
+            q.close(timeout)
+
+    def close(self, timeout=1.0):
+        """Release the broker's resources."""
+        self._shutdown_dispatch(timeout)
+
+    def dispatch_stats(self):
+        """Per-channel dispatch queue counters: { channel: [stats, ...] }"""
+        return {ch: [q.stats() for q in qs]
+                for ch, qs in list(getattr(self, "_dispatch_queues", {}).items())}
@@ -0,0 +1,115 @@
+import threading
+from .message_broker import MessageBroker
+
+###################################
+# Multiplexing Broker Wrapper     #
+###################################
+
+
+class MultiplexBroker(MessageBroker):
+    """
+    Carries several logical sub-channels of a topic on one wire channel.
+
+    routes maps a logical channel suffix to (wire suffix, frame tag). A
+    message for "<base><suffix>" is published on "<base><wire suffix>" as
+    "<tag>:<message>", and the wire subscription routes each frame back to
+    the logical callbacks by its tag. Wire subscriptions stay open once
+    made, so re-subscribing a logical channel never touches the broker.
+    Channels without a matching suffix pass straight through.
+    """
+
+    def __init__(self, broker: MessageBroker, routes):
+        for wire_suffix, tag in routes.values():
+            if len(tag) != 1:
+                raise ValueError(f"Frame tag must be one character: {tag!r}")
+        self.broker = broker
+        self.routes = routes
+        # Longest suffix first so overlapping suffixes resolve correctly
+        self._suffixes = sorted(routes, key=len, reverse=True)
+        # { wire channel: { tag: (logical channel, [callback, ...]) } }
+        self._handlers = {}
+        # { wire channel: Event set once the wire subscription exists }
+        self._wire_ready = {}
+        self._lock = threading.Lock()
+
+    def _route(self, channel):
+        """Return (wire channel, tag) for a logical channel, or None."""
+        for suffix in self._suffixes:
+            if channel.endswith(suffix):
+                wire_suffix, tag = self.routes[suffix]
+                return channel[:-len(suffix)] + wire_suffix, tag
+        return None
+
+    def publish(self, channel, message):
+        route = self._route(channel)
+        if route is None:
+            self.broker.publish(channel, message)
+            return
+        wire, tag = route
+        if isinstance(message, (bytes, bytearray)):
+            frame = tag.encode() + b":" + message
+        else:
+            frame = f"{tag}:{message}"
+        self.broker.publish(wire, frame)
+
+    def _demux(self, wire, frame):
+        if isinstance(frame, (bytes, bytearray)):
+            tag, payload = chr(frame[0]), frame[2:]
+        else:
+            tag, payload = frame[0], frame[2:]
+        with self._lock:
+            entry = self._handlers.get(wire, {}).get(tag)
+            if entry is None:
+                return
+            channel, callbacks = entry[0], list(entry[1])
+        for cb in callbacks:
+            cb(channel, payload)
+
+    def subscribe(self, channel, callback=None):
+        route = self._route(channel)
+        if route is None:
+            self.broker.subscribe(channel, callback)
+            return
+        wire, tag = route
+        with self._lock:
+            new_wire = wire not in self._wire_ready
+            if new_wire:
+                self._wire_ready[wire] = threading.Event()
+            ready = self._wire_ready[wire]
+            tags = self._handlers.setdefault(wire, {})
+            _, callbacks = tags.setdefault(tag, (channel, []))
+            if callback:
+                callbacks.append(callback)
+        if not new_wire:
+            # Another thread may still be subscribing the wire; don't
+            # return (and let the caller publish) before it is in place
+            ready.wait()
+            return
+        try:
+            self.broker.subscribe(wire, self._demux)
+        except Exception:
+            with self._lock:
+                del self._wire_ready[wire]
+            raise
+        finally:
+            ready.set()
+
+    def unsubscribe(self, channel):
+        route = self._route(channel)
+        if route is None:
+            self.broker.unsubscribe(channel)
+            return
+        wire, tag = route
+        # Only the logical handlers go; the wire subscription is kept
+        with self._lock:
+            self._handlers.get(wire, {}).pop(tag, None)
+
+    def start_listener(self):
+        self.broker.start_listener()
+
+    def dispatch_stats(self):
+        return self.broker.dispatch_stats()
+
+    def close(self, *args, **kwargs):
+        if hasattr(self.broker, "close"):
+            self.broker.close(*args, **kwargs)
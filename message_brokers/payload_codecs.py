@@ -0,0 +1,198 @@
+import fnmatch
+import json
+import threading
+import zlib
+from clients import reliable_prefixes
+from .message_broker import MessageBroker
+
+###################################
+# Payload Codecs                  #
+###################################
+
+
+class Codec:
+    """Turns application messages into wire bytes and back."""
+    name = None
+
+    def encode(self, message) -> bytes:
+        raise NotImplementedError
+
+    def decode(self, data: bytes):
+        raise NotImplementedError
+
+
+class RawCodec(Codec):
+    """Bytes in, bytes out; no copies. str is UTF-8 encoded on publish."""
+    name = "raw"
+
+    def encode(self, message):
+        if isinstance(message, str):
+            return message.encode("utf-8")
+        return message
+
+    def decode(self, data):
+        return data
+
+
+class Utf8Codec(Codec):
+    """Text payloads; matches the behaviour of non-binary brokers."""
+    name = "utf8"
+
+    def encode(self, message):
+        if isinstance(message, str):
+            return message.encode("utf-8")
+        return message
+
+    def decode(self, data):
+        return bytes(data).decode("utf-8")
+
+
+class JsonCodec(Codec):
+    name = "json"
+
+    def encode(self, message):
+        return json.dumps(message, separators=(",", ":")).encode("utf-8")
+
+    def decode(self, data):
+        return json.loads(data)
+
+
+class MsgpackCodec(Codec):
+    """Compact binary structured payloads. Needs the optional msgpack package."""
+    name = "msgpack"
+
+    def __init__(self):
+        try:
+            import msgpack
+        except ImportError:
+            raise ImportError(
+                "The 'msgpack' codec requires the msgpack package "
+                "(pip install msgpack)")
+        self._msgpack = msgpack
+
+    def encode(self, message):
+        return self._msgpack.packb(message, use_bin_type=True)
+
+    def decode(self, data):
+        return self._msgpack.unpackb(data, raw=False)
+
+
+class CompressedCodec(Codec):
+    """
+    zlib-compresses the inner codec's output once it reaches threshold bytes.
+    A one-byte header marks whether the frame is compressed.
+    """
+    _PLAIN = b"\x00"
+    _ZLIB = b"\x01"
+
+    def __init__(self, inner: Codec, threshold=1024, level=1):
+        self.inner = inner
+        self.threshold = threshold
+        self.level = level
+        self.name = f"{inner.name}+zlib"
+
+    def encode(self, message):
+        data = self.inner.encode(message)
+        if len(data) >= self.threshold:
+            return self._ZLIB + zlib.compress(data, self.level)
+        return self._PLAIN + data
+
+    def decode(self, data):
+        view = memoryview(data)
+        if view[:1] == self._ZLIB:
+            return self.inner.decode(zlib.decompress(view[1:]))
+        return self.inner.decode(view[1:].tobytes())
+
+
+CODECS = {
+    RawCodec.name: RawCodec,
+    Utf8Codec.name: Utf8Codec,
+    JsonCodec.name: JsonCodec,
+    MsgpackCodec.name: MsgpackCodec,
+}
+
+
+def make_codec(spec) -> Codec:
+    """
+    Build a codec from a config entry: either a codec name ("json") or a
+    dict such as {"codec": "json", "compress_threshold": 4096}.
+    """
+    if isinstance(spec, str):
+        spec = {"codec": spec}
+    name = spec.get("codec", "raw")
+    if name not in CODECS:
+        raise ValueError(f"Unsupported codec: {name}")
+    codec = CODECS[name]()
+    if spec.get("compress_threshold") is not None:
+        codec = CompressedCodec(codec,
+                                threshold=spec["compress_threshold"],
+                                level=spec.get("compress_level", 1))
+    return codec
+
+
+###################################
+# Codec Broker Wrapper            #
+###################################
+
+
+class CodecBroker(MessageBroker):
+    """
+    Encodes and decodes payloads per channel on top of a binary-mode broker.
+
+    channels maps fnmatch patterns to codec specs; the first matching
+    pattern wins and anything unmatched uses default. Channels ending in
+    one of text_suffixes always use utf8, whatever the patterns say: the
+    reliable clients build their sub-channel frames ("images/P2R-Order",
+    "images/R2S-Archived", ...) as str, so a pattern like "images*" only
+    picks the codec of the topic's own channel.
+    """
+
+    def __init__(self, broker: MessageBroker, channels=None, default="utf8",
+                 text_suffixes=reliable_prefixes.SUFFIXES):
+        self.broker = broker
+        self._patterns = [(pattern, make_codec(spec))
+                          for pattern, spec in (channels or {}).items()]
+        self._default = make_codec(default)
+        self._text = Utf8Codec()
+        self._text_suffixes = tuple(text_suffixes)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def codec_for(self, channel) -> Codec:
+        codec = self._cache.get(channel)
+        if codec is None:
+            codec = self._default
+            if channel.endswith(self._text_suffixes):
+                codec = self._text
+            else:
+                for pattern, candidate in self._patterns:
+                    if fnmatch.fnmatchcase(channel, pattern):
+                        codec = candidate
+                        break
+            with self._lock:
+                self._cache[channel] = codec
+        return codec
+
+    def publish(self, channel, message):
+        self.broker.publish(channel, self.codec_for(channel).encode(message))
+
+    def subscribe(self, channel, callback=None):
+        if callback is None:
+            self.broker.subscribe(channel)
+            return
+        codec = self.codec_for(channel)
+        self.broker.subscribe(
+            channel, lambda ch, data: callback(ch, codec.decode(data)))
+
+    def unsubscribe(self, channel):
+        self.broker.unsubscribe(channel)
+
+    def start_listener(self):
+        self.broker.start_listener()
+
+    def dispatch_stats(self):
+        return self.broker.dispatch_stats()
+
+    def close(self, *args, **kwargs):
+        if hasattr(self.broker, "close"):
+            self.broker.close(*args, **kwargs)
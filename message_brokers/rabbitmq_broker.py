@@ -9,11 +9,15 @@ class RabbitMQBroker(MessageBroker):
         port=5672,
         username='guest',
         password='guest',
-        vhost='/'
+        vhost='/',
+        dispatch=None,
+        binary=False
     ):
         """
         RabbitMQ pub/sub via fanout exchanges, with thread-safe publishing.
+        binary=True delivers message bodies as raw bytes.
         """
+        self.binary = binary
         creds = pika.PlainCredentials(username, password)
         self.params = pika.ConnectionParameters(
             host=host,
@@ -29,6 +33,7 @@ class RabbitMQBroker(MessageBroker):
         # Track subscriber threads
         self._declared = set() 
         self.threads = {}
+        self.dispatch_cfg = dispatch
 
     def publish(self, channel, message):
         """
@@ -53,6 +58,7 @@ class RabbitMQBroker(MessageBroker):
         Blocks until queue is ready to receive messages.
         """
         ready = threading.Event()
+        callback = self._dispatch(channel, callback)
 
         def _consume():
             try:
@@ -74,7 +80,7 @@ class RabbitMQBroker(MessageBroker):
 
                 def _on_message(ch_, method, props, body):
                     if callback:
-                        callback(channel, body.decode())
+                        callback(channel, body if self.binary else body.decode())
 
                 ch.basic_consume(
                     queue=queue_name,
@@ -93,9 +99,10 @@ class RabbitMQBroker(MessageBroker):
 
     def unsubscribe(self, channel):
         """
-        No-op: subscriber queues auto-delete on connection close.
+        Stop the channel's dispatch queues; subscriber queues themselves
+        auto-delete on connection close.
         """
-        pass
+        self._close_dispatch(channel)
 
     def start_listener(self):
         """
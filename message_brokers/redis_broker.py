@@ -9,23 +9,29 @@ import redis
 
 
 class RedisMessageBroker(MessageBroker):
-    def __init__(self, host='localhost', port=6379):
+    def __init__(self, host='localhost', port=6379, dispatch=None,
+                 binary=False):
+        # binary=True delivers payloads as raw bytes instead of str
+        self.binary = binary
         # Publisher connection
         self.publisher = redis.Redis(
-            host=host, port=port, decode_responses=True)
+            host=host, port=port, decode_responses=not binary)
         # Subscriber connection
         self.subscriber = redis.Redis(
-            host=host, port=port, decode_responses=True)
+            host=host, port=port, decode_responses=not binary)
         self.pubsub = self.subscriber.pubsub()
         # Dictionary to store callbacks for each channel
         self.callbacks = {}  # { channel: [callback, ...] }
+        # Optional bounded dispatch queue config (see dispatch_queue.py)
+        self.dispatch_cfg = dispatch
         self.listening_thread = None
 
     def subscribe(self, channel, callback=None):
         if callback:
             if channel not in self.callbacks:
                 self.callbacks[channel] = []
-            self.callbacks[channel].append(callback)
+            self.callbacks[channel].append(
+                self._dispatch(channel, callback))
         # Issue subscribe command even if the channel is already subscribed;
         # Redis will ignore duplicate subscriptions.
         self.pubsub.subscribe(channel)
@@ -35,6 +41,7 @@ class RedisMessageBroker(MessageBroker):
     def unsubscribe(self, channel):
         if channel in self.callbacks:
             del self.callbacks[channel]
+        self._close_dispatch(channel)
         self.pubsub.unsubscribe(channel)
         #time.sleep(0.00001)
 
@@ -52,6 +59,8 @@ class RedisMessageBroker(MessageBroker):
                         # We only care about messages of type 'message'
                         if message['type'] == 'message':
                             ch = message['channel']
+                            if isinstance(ch, bytes):
+                                ch = ch.decode()
                             data = message['data']
                             # Dispatch the message to all callbacks registered for this channel
                             if ch in self.callbacks:
@@ -0,0 +1,147 @@
+import bisect
+import hashlib
+import threading
+from clients import reliable_prefixes
+from .message_broker import MessageBroker
+
+###################################
+# Client-side Sharding Broker     #
+###################################
+
+
+def shard_key(channel, suffixes=reliable_prefixes.SUFFIXES):
+    """
+    The part of a channel that decides its shard: the channel with any
+    reliable sub-channel suffix stripped, so "status", "status/P2R-Order"
+    and "status/R2P-ACK" land on the same shard while hierarchical topics
+    such as "sensors/temp" and "sensors/humidity" still spread out.
+    """
+    for suffix in suffixes:
+        if channel.endswith(suffix):
+            return channel[:-len(suffix)]
+    return channel
+
+
+def _hash(key):
+    return int.from_bytes(hashlib.md5(key.encode("utf-8")).digest()[:8], "big")
+
+
+class ShardedBroker(MessageBroker):
+    """
+    Spreads channels over several brokers with a consistent-hash ring.
+
+    shards maps a stable shard name to a MessageBroker; each name gets
+    vnodes points on the ring. Adding or removing a shard only moves the
+    channels whose ring segment changed, and their subscriptions are
+    re-created on the new owner.
+    """
+
+    def __init__(self, shards: dict, vnodes=100,
+                 suffixes=reliable_prefixes.SUFFIXES):
+        self.vnodes = vnodes
+        # Longest first so overlapping suffixes resolve correctly
+        self.suffixes = sorted(suffixes, key=len, reverse=True)
+        self.shards = {}
+        self._ring_hashes = []
+        self._ring_names = []
+        # { channel: [callback, ...] } and { channel: shard name }
+        self._subs = {}
+        self._owner = {}
+        self._listening = False
+        self._lock = threading.RLock()
+        for name, broker in shards.items():
+            self._insert(name, broker)
+
+    def _insert(self, name, broker):
+        if name in self.shards:
+            raise ValueError(f"Duplicate shard name: {name}")
+        self.shards[name] = broker
+        for i in range(self.vnodes):
+            h = _hash(f"{name}#{i}")
+            idx = bisect.bisect(self._ring_hashes, h)
+            self._ring_hashes.insert(idx, h)
+            self._ring_names.insert(idx, name)
+
+    def shard_for(self, channel):
+        """Name of the shard that owns a channel."""
+        with self._lock:
+            if not self._ring_hashes:
+                raise RuntimeError("ShardedBroker has no shards")
+            idx = bisect.bisect(self._ring_hashes,
+                                _hash(shard_key(channel, self.suffixes)))
+            return self._ring_names[idx % len(self._ring_names)]
+
+    def _broker_for(self, channel):
+        return self.shards[self.shard_for(channel)]
+
+    def publish(self, channel, message):
+        self._broker_for(channel).publish(channel, message)
+
+    def subscribe(self, channel, callback=None):
+        with self._lock:
+            name = self.shard_for(channel)
+            callbacks = self._subs.setdefault(channel, [])
+            if callback:
+                callbacks.append(callback)
+            self._owner[channel] = name
+        self.shards[name].subscribe(channel, callback)
+
+    def unsubscribe(self, channel):
+        with self._lock:
+            self._subs.pop(channel, None)
+            name = self._owner.pop(channel, None)
+        if name is not None:
+            self.shards[name].unsubscribe(channel)
+
+    def _rebalance(self):
+        """Move subscriptions whose owning shard changed."""
+        moved = []
+        with self._lock:
+            for channel, old in list(self._owner.items()):
+                new = self.shard_for(channel)
+                if new != old:
+                    self._owner[channel] = new
+                    moved.append((channel, old, new, list(self._subs[channel])))
+        for channel, old, new, callbacks in moved:
+            if old in self.shards:
+                self.shards[old].unsubscribe(channel)
+            for cb in callbacks or [None]:
+                self.shards[new].subscribe(channel, cb)
+        return [channel for channel, *_ in moved]
+
+    def add_shard(self, name, broker):
+        """Add a shard and move only the channels it now owns. Returns them."""
+        with self._lock:
+            self._insert(name, broker)
+            if self._listening:
+                broker.start_listener()
+        return self._rebalance()
+
+    def remove_shard(self, name):
+        """Remove a shard and move its channels to the rest. Returns them."""
+        with self._lock:
+            keep = [(h, n) for h, n in zip(self._ring_hashes, self._ring_names)
+                    if n != name]
+            self._ring_hashes = [h for h, _ in keep]
+            self._ring_names = [n for _, n in keep]
+            broker = self.shards.pop(name)
+        moved = self._rebalance()
+        for channel in moved:
+            broker.unsubscribe(channel)
+        return moved
+
+    def start_listener(self):
+        with self._lock:
+            self._listening = True
+            brokers = list(self.shards.values())
+        for broker in brokers:
+            broker.start_listener()
+
+    def dispatch_stats(self):
+        return {name: broker.dispatch_stats()
+                for name, broker in self.shards.items()}
+
+    def close(self, *args, **kwargs):
+        for broker in self.shards.values():
+            if hasattr(broker, "close"):
+                broker.close(*args, **kwargs)
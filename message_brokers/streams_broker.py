@@ -10,12 +10,17 @@ class RedisStreamsBroker(MessageBroker):
     - Single consumer-group for all streams to batch reads
     - One background worker thread instead of one per channel
     - Blocking reads with tunable batch size
+    - Optional bounded dispatch queues; the batch size is capped at the
+      high watermark so a slow callback stalls reads instead of piling up
     """
     def __init__(self, host='localhost', port=6379,
-                 group_name=None, read_count=10000, block_ms=5):
-        # shared Redis client
+                 group_name=None, read_count=10000, block_ms=5,
+                 dispatch=None, binary=False):
+        # shared Redis client; binary=True leaves payloads as raw bytes
+        self.binary = binary
+        self._data_field = b"data" if binary else "data"
         self.redis = redis.Redis(host=host, port=port,
-                                 decode_responses=True)
+                                 decode_responses=not binary)
         # unique consumer and group
         self.group = group_name or f"grp:streams"
         self.consumer = f"cons:{uuid.uuid4().hex}"
@@ -24,6 +29,10 @@ class RedisStreamsBroker(MessageBroker):
         self._lock = threading.Lock()
         # read parameters
         self._read_count = read_count
+        self.dispatch_cfg = dispatch
+        if dispatch:
+            self._read_count = min(read_count,
+                                   dispatch.get("high_watermark", 1000))
         self._block_ms = block_ms
         # stop signal and worker thread
         self._stop_evt = threading.Event()
@@ -57,12 +66,14 @@ class RedisStreamsBroker(MessageBroker):
             return
         with self._lock:
             self._ensure_group(channel)
-            self._streams[channel] = callback
+            self._close_dispatch(channel)
+            self._streams[channel] = self._dispatch(channel, callback)
 
     def unsubscribe(self, channel):
         """Stop dispatching messages from the given stream."""
         with self._lock:
             self._streams.pop(channel, None)
+            self._close_dispatch(channel)
 
     def _worker(self):
         """Background loop: batch-read from all subscribed streams."""
@@ -85,11 +96,13 @@ class RedisStreamsBroker(MessageBroker):
                     continue
                 # resp: list of (stream, [(id, {field: val}), ...])
                 for stream, entries in resp:
+                    if isinstance(stream, bytes):
+                        stream = stream.decode()
                     cb = callbacks.get(stream)
                     if not cb:
                         continue
                     for msg_id, fields in entries:
-                        cb(stream, fields['data'])
+                        cb(stream, fields[self._data_field])
                         self.redis.xack(stream, self.group, msg_id)
             except Exception:
                 # on any error, sleep briefly before retry
@@ -103,6 +116,7 @@ class RedisStreamsBroker(MessageBroker):
         """Shut down the worker and close the Redis client."""
         self._stop_evt.set()
         self._thread.join(timeout)
+        self._shutdown_dispatch(timeout)
         try:
             self.redis.close()
         except:
@@ -6,6 +6,7 @@ import time
 import threading
 import os
 from message_brokers.factory import get_broker
+from clients import reliable_prefixes
 from clients.reliabie_client import ReliableClient
 from clients.repository_client import RepositoryClient
 
@@ -19,8 +20,10 @@ class ConfigurableMessagingSystem:
         # "redis" | "rabbitmq" | "kafka"
         sel = cfg["selected_broker"]
         broker_cfg = cfg["brokers"][sel]
-        broker_cfg["type"] = sel
-        self.broker = get_broker(broker_cfg)
+        broker_cfg.setdefault("type", sel)
+        self.broker_cfg = broker_cfg
+        self.brokers = []
+        self.broker = self._make_broker()
         self.clients = {}
         self.publisher_threads = []
 
@@ -31,6 +34,28 @@ class ConfigurableMessagingSystem:
         # Initialize clients from config
         self.load_clients(cfg)
 
+    def _make_broker(self):
+        broker = get_broker(self.broker_cfg)
+        # The reliable clients speak str; a bare binary broker delivers
+        # bytes, so decode it as UTF-8 (a "codecs" block already does this)
+        if self.broker_cfg.get("binary") and not self.broker_cfg.get("codecs"):
+            from message_brokers.payload_codecs import CodecBroker
+            broker = CodecBroker(broker, default="utf8")
+        # Optional fault injection, e.g.
+        # "faults": {"seed": 1, "channels": {"*": {"drop": 0.01}}}
+        faults = self.broker_cfg.get("faults")
+        if faults:
+            from message_brokers.fault_broker import FaultInjectingBroker
+            broker = FaultInjectingBroker(broker, faults.get("channels"),
+                                          seed=faults.get("seed"))
+        # Optionally carry all reliable sub-channels of a topic on a few
+        # tagged wire channels
+        if self.broker_cfg.get("multiplex"):
+            from message_brokers.multiplex_broker import MultiplexBroker
+            broker = MultiplexBroker(broker, reliable_prefixes.MUX_ROUTES)
+        self.brokers.append(broker)
+        return broker
+
     def load_clients(self, config):
         for client_config in config.get('clients', []):
             client_id = client_config.get('id')
@@ -38,11 +63,22 @@ class ConfigurableMessagingSystem:
                 continue
 
             client_log_dir = os.path.join(self.output_dir, client_id)
-            if client_id == "repository":
+            if client_config.get('role') == "repository" or client_id == "repository":
+                heartbeat_ms = client_config.get('heartbeat_ms')
+                failover_ms = client_config.get('failover_ms')
+                # Partitioned repositories get their own connection, as they
+                # would in separate processes
+                broker = self._make_broker() if heartbeat_ms else self.broker
                 client = RepositoryClient(
-                    client_id, self.broker, client_log_dir, client_config.get('fault_rate'))
+                    client_id, broker, client_log_dir,
+                    client_config.get('fault_rate', 0.05),
+                    heartbeat_interval=heartbeat_ms and heartbeat_ms / 1000.0,
+                    failover_timeout=failover_ms and failover_ms / 1000.0)
             else:
-                client = ReliableClient(client_id, self.broker, client_log_dir)
+                ack_timeout_ms = client_config.get('ack_timeout_ms', 1000)
+                client = ReliableClient(
+                    client_id, self.broker, client_log_dir,
+                    ack_timeout=ack_timeout_ms / 1000.0 if ack_timeout_ms else None)
 
             for channel in client_config.get('subscribe', []):
                 client.subscribe(channel)
@@ -76,7 +112,17 @@ class ConfigurableMessagingSystem:
 
     def start(self):
         print(f"Starting {self.broker.__class__.__name__} listener...")
-        self.broker.start_listener()
+        for broker in self.brokers:
+            broker.start_listener()
+
+        # Repository instances join their group together
+        repositories = [c for c in self.clients.values()
+                        if isinstance(c, RepositoryClient)]
+        joins = [threading.Thread(target=r.start) for r in repositories]
+        for t in joins:
+            t.start()
+        for t in joins:
+            t.join()
 
         print("Starting publisher threads...")
         for t in self.publisher_threads:
@@ -88,6 +134,8 @@ class ConfigurableMessagingSystem:
                 time.sleep(1)
         except KeyboardInterrupt:
             print("\nShutting down...")
+            for r in repositories:
+                r.stop()
 
 
 def main():
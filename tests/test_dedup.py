@@ -0,0 +1,60 @@
+import unittest
+from unittest import mock
+from clients.dedup import DedupWindow
+
+
+class DedupWindowTest(unittest.TestCase):
+
+    def test_seen_after_add(self):
+        window = DedupWindow()
+        self.assertFalse(window.seen("a"))
+        window.add("a")
+        self.assertTrue(window.seen("a"))
+        self.assertEqual(window.stats()["hits"], 1)
+        self.assertEqual(window.stats()["misses"], 1)
+
+    def test_evicts_oldest_past_max_entries(self):
+        window = DedupWindow(max_entries=3)
+        for msg_id in "abcd":
+            window.add(msg_id)
+        self.assertFalse(window.seen("a"))
+        self.assertTrue(all(window.seen(msg_id) for msg_id in "bcd"))
+        self.assertEqual(window.stats()["entries"], 3)
+
+    def test_ttl_expires_ids(self):
+        now = [100.0]
+        with mock.patch("clients.dedup.time.monotonic", lambda: now[0]):
+            window = DedupWindow(ttl=10)
+            window.add("a")
+            now[0] += 5
+            window.add("b")
+            now[0] += 6
+            self.assertFalse(window.seen("a"))
+            self.assertTrue(window.seen("b"))
+
+    def test_bloom_never_gives_false_negative(self):
+        # Small filter, many rotations: every ID still in the exact set
+        # must be reported seen
+        plain = DedupWindow(max_entries=100)
+        bloom = DedupWindow(max_entries=100, bloom_bits=4096)
+        for i in range(1000):
+            msg_id = f"p:{i}"
+            plain.add(msg_id)
+            bloom.add(msg_id)
+            for j in range(max(0, i - 99), i + 1):
+                self.assertTrue(bloom.seen(f"p:{j}"))
+        for i in range(1100):
+            msg_id = f"p:{i}"
+            self.assertEqual(bloom.seen(msg_id), plain.seen(msg_id))
+
+    def test_bloom_skips_unseen_ids(self):
+        window = DedupWindow(max_entries=100, bloom_bits=1 << 16)
+        for i in range(100):
+            window.add(f"p:{i}")
+        for i in range(100, 200):
+            self.assertFalse(window.seen(f"p:{i}"))
+        self.assertGreater(window.stats()["bloom_skips"], 90)
+
+
+if __name__ == "__main__":
+    unittest.main()
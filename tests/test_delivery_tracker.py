@@ -0,0 +1,127 @@
+import unittest
+from clients.delivery_tracker import DeliveryTracker
+
+
+class DeliveryTrackerTest(unittest.TestCase):
+
+    def test_no_subscribers_keeps_window_empty(self):
+        tracker = DeliveryTracker(max_window=4)
+        for _ in range(100):
+            tracker.issue()
+        self.assertEqual(tracker.head, 100)
+        self.assertEqual(tracker.delivered_upto(), 100)
+        self.assertEqual(len(tracker.window), 0)
+
+    def test_delivered_upto_waits_for_every_subscriber(self):
+        tracker = DeliveryTracker()
+        tracker.join("a")
+        tracker.join("b")
+        for _ in range(3):
+            tracker.issue()
+        tracker.ack("a", 1)
+        tracker.ack("a", 2)
+        self.assertEqual(tracker.delivered_upto(), 0)
+        tracker.ack("b", 2)
+        self.assertEqual(tracker.delivered_upto(), 0)
+        tracker.ack("b", 1)
+        self.assertEqual(tracker.delivered_upto(), 2)
+        self.assertEqual(len(tracker.window), 1)
+
+    def test_join_tracks_from_next_seq(self):
+        tracker = DeliveryTracker()
+        tracker.join("a")
+        tracker.issue()
+        tracker.issue()
+        tracker.join("b")
+        tracker.issue()
+        tracker.ack("a", 1)
+        tracker.ack("a", 2)
+        tracker.ack("a", 3)
+        # b owes nothing before seq 3
+        self.assertEqual(tracker.delivered_upto(), 2)
+        tracker.ack("b", 3)
+        self.assertEqual(tracker.delivered_upto(), 3)
+
+    def test_ack_from_unknown_subscriber_registers_it(self):
+        tracker = DeliveryTracker()
+        tracker.join("a")
+        for _ in range(3):
+            tracker.issue()
+        self.assertTrue(tracker.ack("b", 2))
+        self.assertIn("b", tracker.subscribers)
+        self.assertEqual(tracker.missing("b", 3), [3])
+
+    def test_ack_outside_window_is_rejected(self):
+        tracker = DeliveryTracker()
+        tracker.join("a")
+        tracker.issue()
+        self.assertFalse(tracker.ack("a", 0))
+        self.assertFalse(tracker.ack("a", 2))
+        self.assertTrue(tracker.ack("a", 1))
+        self.assertFalse(tracker.ack("a", 1))
+
+    def test_missing_lists_gaps(self):
+        tracker = DeliveryTracker()
+        tracker.join("a")
+        for _ in range(6):
+            tracker.issue()
+        for seq in (1, 3, 4, 6):
+            tracker.ack("a", seq)
+        self.assertEqual(tracker.missing("a", 6), [2, 5])
+        self.assertEqual(tracker.missing("a", 4), [2])
+        self.assertEqual(tracker.missing("nobody", 6), [])
+
+    def test_window_never_exceeds_max_window(self):
+        tracker = DeliveryTracker(max_window=8)
+        tracker.join("slow")
+        tracker.join("fast")
+        for _ in range(50):
+            seq = tracker.issue()
+            tracker.ack("fast", seq)
+            self.assertLessEqual(len(tracker.window), 8)
+        # The lagging subscriber was dropped and the rest is delivered
+        self.assertNotIn("slow", tracker.subscribers)
+        self.assertEqual(tracker.delivered_upto(), 50)
+
+    def test_lagging(self):
+        tracker = DeliveryTracker()
+        tracker.join("a")
+        tracker.join("b")
+        for _ in range(5):
+            seq = tracker.issue()
+            tracker.ack("a", seq)
+        self.assertEqual(tracker.lagging(3), ["b"])
+        self.assertEqual(tracker.lagging(5), [])
+
+    def test_dropped_index_is_reused(self):
+        tracker = DeliveryTracker()
+        tracker.join("keep")
+        for i in range(200):
+            tracker.join(f"s{i}")
+            tracker.drop(f"s{i}")
+        self.assertEqual(len(tracker.low_water), 2)
+        self.assertEqual(tracker.stats()["subscribers"], 1)
+
+    def test_reused_index_forgets_previous_acks(self):
+        tracker = DeliveryTracker()
+        tracker.join("keep")
+        tracker.join("old")
+        tracker.issue()
+        tracker.issue()
+        tracker.ack("old", 2)
+        tracker.drop("old")
+        tracker.join("new")
+        tracker.issue()
+        # "new" inherits the index but not the ACK of seq 2 (which it
+        # never owed) nor any claim on seq 3
+        tracker.ack("keep", 1)
+        tracker.ack("keep", 2)
+        tracker.ack("keep", 3)
+        self.assertEqual(tracker.delivered_upto(), 2)
+        self.assertEqual(tracker.missing("new", 3), [3])
+        tracker.ack("new", 3)
+        self.assertEqual(tracker.delivered_upto(), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,176 @@
+import threading
+import time
+import unittest
+from message_brokers.dispatch_queue import DispatchQueue
+from message_brokers.message_broker import MessageBroker
+
+
+class Collector:
+    """Callback that records messages and can be held up by a gate."""
+
+    def __init__(self, gated=False):
+        self.messages = []
+        self.gate = threading.Event()
+        if not gated:
+            self.gate.set()
+        self.entered = threading.Event()
+        self._done = threading.Condition()
+
+    def __call__(self, channel, message):
+        self.entered.set()
+        self.gate.wait()
+        with self._done:
+            self.messages.append(message)
+            self._done.notify_all()
+
+    def wait_for(self, count, timeout=2.0):
+        with self._done:
+            return self._done.wait_for(lambda: len(self.messages) >= count,
+                                       timeout)
+
+
+class DispatchQueueTest(unittest.TestCase):
+
+    def _queue(self, callback, **kwargs):
+        q = DispatchQueue(callback, **kwargs)
+        self.addCleanup(q.close)
+        return q
+
+    def _fill(self, q, collector, count):
+        # The worker takes the first message and blocks in the callback;
+        # the rest stay queued
+        q.put("ch", 0)
+        self.assertTrue(collector.entered.wait(2.0))
+        for i in range(1, count):
+            q.put("ch", i)
+
+    def test_rejects_bad_config(self):
+        with self.assertRaises(ValueError):
+            DispatchQueue(print, policy="nope")
+        with self.assertRaises(ValueError):
+            DispatchQueue(print, high_watermark=0)
+        with self.assertRaises(ValueError):
+            DispatchQueue(print, high_watermark=4, low_watermark=4)
+
+    def test_delivers_in_order(self):
+        collector = Collector()
+        q = self._queue(collector)
+        for i in range(100):
+            q.put("ch", i)
+        self.assertTrue(collector.wait_for(100))
+        self.assertEqual(collector.messages, list(range(100)))
+
+    def test_drop_oldest(self):
+        collector = Collector(gated=True)
+        q = self._queue(collector, high_watermark=4, policy="drop_oldest")
+        self._fill(q, collector, 10)
+        collector.gate.set()
+        self.assertTrue(collector.wait_for(5))
+        self.assertEqual(collector.messages, [0, 6, 7, 8, 9])
+        self.assertEqual(q.stats()["dropped"], 5)
+
+    def test_drop_newest(self):
+        collector = Collector(gated=True)
+        q = self._queue(collector, high_watermark=4, policy="drop_newest")
+        self._fill(q, collector, 10)
+        collector.gate.set()
+        self.assertTrue(collector.wait_for(5))
+        self.assertEqual(collector.messages, [0, 1, 2, 3, 4])
+        self.assertEqual(q.stats()["dropped"], 5)
+
+    def test_block_stalls_until_low_watermark(self):
+        collector = Collector(gated=True)
+        q = self._queue(collector, high_watermark=4, low_watermark=1,
+                        policy="block")
+        self._fill(q, collector, 5)
+        producer = threading.Thread(target=q.put, args=("ch", 5), daemon=True)
+        producer.start()
+        producer.join(0.1)
+        self.assertTrue(producer.is_alive())
+        collector.gate.set()
+        producer.join(2.0)
+        self.assertFalse(producer.is_alive())
+        self.assertTrue(collector.wait_for(6))
+        self.assertEqual(collector.messages, list(range(6)))
+        self.assertGreater(q.stats()["stall_time"], 0)
+
+    def test_spill_preserves_order(self):
+        collector = Collector(gated=True)
+        q = self._queue(collector, high_watermark=4, policy="spill")
+        self._fill(q, collector, 50)
+        self.assertGreater(q.stats()["spill_depth"], 0)
+        collector.gate.set()
+        self.assertTrue(collector.wait_for(50))
+        self.assertEqual(collector.messages, list(range(50)))
+        self.assertEqual(q.depth(), 0)
+
+    def test_detach_discards_and_attach_resumes(self):
+        old = Collector(gated=True)
+        q = self._queue(old, high_watermark=4, policy="spill")
+        self._fill(q, old, 10)
+        q.detach()
+        q.put("ch", "ignored")
+        old.gate.set()
+        new = Collector()
+        q.attach(new)
+        q.put("ch", "after")
+        self.assertTrue(new.wait_for(1))
+        time.sleep(0.05)
+        # Only the message already in the old callback reached it
+        self.assertEqual(old.messages, [0])
+        self.assertEqual(new.messages, ["after"])
+        self.assertEqual(q.depth(), 0)
+
+    def test_close_joins_worker(self):
+        q = DispatchQueue(Collector())
+        q.close()
+        self.assertFalse(q._thread.is_alive())
+
+
+class _StubBroker(MessageBroker):
+    def __init__(self, dispatch):
+        self.dispatch_cfg = dispatch
+        self.callbacks = {}
+
+    def subscribe(self, channel, callback=None):
+        self.callbacks[channel] = self._dispatch(channel, callback)
+
+    def unsubscribe(self, channel):
+        self.callbacks.pop(channel, None)
+        self._close_dispatch(channel)
+
+    def publish(self, channel, message):
+        self.callbacks[channel](channel, message)
+
+    def start_listener(self):
+        pass
+
+
+class BrokerDispatchTest(unittest.TestCase):
+
+    def test_resubscribe_reuses_worker(self):
+        broker = _StubBroker({"high_watermark": 8})
+        self.addCleanup(broker.close)
+        threads = threading.active_count()
+        collector = Collector()
+        for i in range(50):
+            broker.subscribe("ack", collector)
+            broker.publish("ack", i)
+            self.assertTrue(collector.wait_for(i + 1))
+            broker.unsubscribe("ack")
+        self.assertEqual(threading.active_count(), threads + 1)
+        self.assertEqual(collector.messages, list(range(50)))
+
+    def test_close_stops_every_worker(self):
+        broker = _StubBroker({"high_watermark": 8})
+        threads = threading.active_count()
+        broker.subscribe("a", Collector())
+        broker.subscribe("b", Collector())
+        broker.unsubscribe("b")
+        broker.close()
+        self.assertEqual(threading.active_count(), threads)
+        self.assertEqual(broker.dispatch_stats(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()